@@ -1,7 +1,7 @@
+import argparse
 import asyncio
 import logging
 import sys
-import inspect
 
 from solipsism.core.context import Context
 from solipsism.core.system import System
@@ -12,7 +12,7 @@ from solipsism.interface.user_context import UserContext
 from solipsism.interface.chat_interface import ChatInterface
 
 
-async def main():
+async def main(lite: bool = False):
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(name)s.%(funcName)s - %(levelname)s - %(message)s',
@@ -48,7 +48,12 @@ async def main():
     manager.add_context(user_context)
 
     # 5. 最初のLLMContextをUserContextの子としてセットアップする
-    llm = GeminiLLM(model="gemini-2.5-pro", thinking_budget=-1)
+    if lite:
+        llm = GeminiLLM()
+        max_turns, turn_sleep = 1000, 5
+    else:
+        llm = GeminiLLM(model="gemini-2.5-pro", thinking_budget=-1)
+        max_turns, turn_sleep = 100, 15
     llm_system = System()
 
     # 初期コンテクストに基本的なツール群を付与する
@@ -63,15 +68,9 @@ async def main():
         if tool_class:
             try:
                 # DI引数を使用してツールをインスタンス化する
-                sig = inspect.signature(tool_class.__init__)
-                params = {}
-                for param in sig.parameters.values():
-                    if param.name == 'self':
-                        continue
-                    if param.name in tool_init_args:
-                        params[param.name] = tool_init_args[param.name]
-                
-                instance = tool_class(**params)
+                instance = tool_manager.instantiate_tool(
+                    tool_class, tool_init_args
+                )
                 llm_system.add_tool(instance)
             except Exception as e:
                 logger.error(
@@ -113,17 +112,27 @@ async def main():
         "Start by introducing yourself to your parent (the user)."
     )
     
-    llm_task = llm_context.start(initial_task=initial_task, max_turns=100, turn_sleep=15)
-    chat_task = chat_interface.start()
-
-    await asyncio.gather(llm_task, chat_task)
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(
+            llm_context.start(
+                initial_task=initial_task, max_turns=max_turns,
+                turn_sleep=turn_sleep
+            )
+        )
+        tg.create_task(chat_interface.start())
 
     logger.info("Solipsism application has finished its run.")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Solipsism agent.")
+    parser.add_argument(
+        "--lite", action="store_true",
+        help="Use the default (flash) model with more, shorter-spaced turns."
+    )
+    args = parser.parse_args()
     try:
-        asyncio.run(main())
+        asyncio.run(main(lite=args.lite))
     except (KeyboardInterrupt, EOFError):
         print("\nApplication interrupted by user. Exiting...")
     except Exception as e:
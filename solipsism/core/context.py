@@ -1,6 +1,7 @@
 import asyncio
-import hashlib
+import functools
 import logging
+import os
 import re
 import uuid
 from datetime import datetime, timezone
@@ -8,12 +9,19 @@ from enum import Enum, auto
 from typing import List, Optional
 
 from .llm import BaseLLM, History, Message, TextPart
-from .lpml import Element, deparse, findall, parse
+from .lpml import HistoryElement, deparse_one, iterfindall, parse
 from .system import System
 
 logger = logging.getLogger(__name__)
 
-ConversationHistory = List[Element]
+ConversationHistory = List[HistoryElement]
+
+
+# <assistant ...> と </assistant> を一度の走査で除去するためのパターン
+_ASSISTANT_TAG_RE = re.compile(r'</?assistant\b[^>]*>', re.IGNORECASE)
+
+# <wait> の有無を事前に判定するためのパターン
+_STOP_TAG_RE = re.compile(r'<wait(\s|/?>)', re.IGNORECASE)
 
 
 class ContextState(Enum):
@@ -24,11 +32,20 @@ class ContextState(Enum):
     TERMINATED = auto()
 
 
+@functools.lru_cache(maxsize=32)
+def _load_base_prompt(path: str) -> str:
+    """
+    ベースプロンプトを読み込む。結果は絶対パスをキーにキャッシュされ、
+    同じプロンプトを使う子コンテクスト間で共有される。
+    ファイルが存在しない場合はFileNotFoundErrorを送出する（失敗はキャッシュされない）。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
 def _generate_id():
-    """SHA224に基づくユニークな8文字のIDを生成する。"""
-    unique_id = uuid.uuid4()
-    hash_object = hashlib.sha224(str(unique_id).encode())
-    return hash_object.hexdigest()[:8]
+    """UUID4に基づくユニークな8文字のIDを生成する。"""
+    return uuid.uuid4().hex[:8]
 
 
 class Context:
@@ -38,10 +55,16 @@ class Context:
     """
 
     def __init__(self, llm: BaseLLM, system: System, base_prompt_path: str,
-                 parent_id: Optional[str] = None):
-        self.id = _generate_id()
+                 parent_id: Optional[str] = None,
+                 context_id: Optional[str] = None,
+                 max_history_elements: Optional[int] = 64):
+        self.id = context_id or _generate_id()
         self.parent_id = parent_id
         self.child_ids: List[str] = []
+        # 初期メッセージのうち、IDに依存する固定部分をあらかじめ構築しておく
+        self._initial_prefix = f"context id: {self.id}"
+        if self.parent_id:
+            self._initial_prefix += f"\nparent id: {self.parent_id}"
 
         self.llm = llm
         self.system = system
@@ -49,10 +72,19 @@ class Context:
         self.conversation_history: ConversationHistory = []
         self.state = ContextState.IDLE
         self.turn_count = 0
+        # 保持する履歴要素の上限。Noneの場合は無制限。
+        # 超過時は最初のシステムメッセージ（IDとタスク）を残して古いものから破棄する
+        self.max_history_elements = max_history_elements
+        self._prompt_cache: Optional[str] = None
+        self._prompt_tools_version: Optional[int] = None
+        # LLMに渡すHistory。先頭要素はプロンプト用に予約し、以降は履歴に追従する
+        self._history_cache: History = [Message(role="user")]
+        self._current_turn_ts: Optional[str] = None
 
         try:
-            with open(base_prompt_path, 'r', encoding='utf-8') as f:
-                self.base_prompt = f.read()
+            self.base_prompt = _load_base_prompt(
+                os.path.abspath(base_prompt_path)
+            )
             logger.info(f"Base prompt loaded from {base_prompt_path}")
         except FileNotFoundError:
             logger.error(f"Base prompt file not found at: {base_prompt_path}")
@@ -60,63 +92,95 @@ class Context:
 
     @property
     def prompt(self):
-        """システムプロンプトとツール定義を結合したプロンプトを返す。"""
-        return self.base_prompt + "\n\n" + self.system.get_tool_definitions()
+        """
+        システムプロンプトとツール定義を結合したプロンプトを返す。
+        ツール構成が変化しない限り、前回生成した文字列を再利用する。
+        """
+        if (self._prompt_cache is None or
+                self._prompt_tools_version != self.system.tools_version):
+            self._prompt_cache = "\n\n".join(
+                (self.base_prompt, self.system.get_tool_definitions())
+            )
+            self._prompt_tools_version = self.system.tools_version
+        return self._prompt_cache
+
+    def _refresh_timestamp(self):
+        """現在のターンで履歴に付与するタイムスタンプを更新する。"""
+        self._current_turn_ts = datetime.now(timezone.utc).isoformat(
+            timespec='microseconds'
+        )
 
     def _get_timestamp(self) -> str:
-        """ISO 8601形式のUTCタイムスタンプを返す。"""
-        return datetime.now(timezone.utc).isoformat()
+        """
+        ISO 8601形式のUTCタイムスタンプを返す。
+        同じループ反復内で追加される要素は、直近に更新した値を共有する。
+        """
+        if self._current_turn_ts is None:
+            self._refresh_timestamp()
+        return self._current_turn_ts
 
     def _add_to_history(self, tag: str, content: str):
         """タイムスタンプとターン数を付加して履歴に要素を追加する。"""
-        element = {
-            "tag": tag,
-            "attributes": {
-                "turn": str(self.turn_count),
-                "timestamp": self._get_timestamp()
-            },
-            "content": "\n" + content + "\n"
-        }
+        element = HistoryElement(
+            tag=tag,
+            turn=self.turn_count,
+            timestamp=self._get_timestamp(),
+            content=content
+        )
         self.conversation_history.append(element)
 
+        # LLM向けのHistoryにも、文字列化したメッセージを逐次追加しておく
+        if tag == "assistant":
+            role = "assistant"
+        elif tag == "system":
+            # システムからの通知（ツール結果など）はuserロールとして扱う
+            role = "user"
+        else:
+            logger.warning(f"Unsupported tag '{tag}' skipped.")
+            role = None
+        if role is not None:
+            self._history_cache.append(
+                Message(role=role, parts=[TextPart(text=deparse_one(element))])
+            )
+
+        self._evict_old_history()
+
+    def _evict_old_history(self):
+        """履歴要素数が上限を超えた場合、最初の要素を残して古い要素から破棄する。"""
+        limit = self.max_history_elements
+        if limit is None:
+            return
+        while len(self.conversation_history) > limit:
+            del self.conversation_history[1]
+        # _history_cacheの先頭はプロンプト用のため、要素数は1つ多い
+        while len(self._history_cache) > limit + 1:
+            del self._history_cache[2]
+
     def _sanitize_llm_response(self, lpml_string: str) -> str:
         """LLMの応答から<assistant>タグを除去し、クリーンアップする。"""
-        cleaned = re.sub(
-            r'<assistant[^>]*>', '', lpml_string, flags=re.IGNORECASE
-        )
-        cleaned = re.sub(
-            r'</assistant>', '', cleaned, flags=re.IGNORECASE
-        )
-        return cleaned.strip()
+        # 典型的な「応答全体が<assistant>で囲まれている」場合は、スライスのみで外側を除去する
+        text = lpml_string.strip()
+        if text.startswith('<a') and text.endswith('</assistant>'):
+            opening = _ASSISTANT_TAG_RE.match(text)
+            if opening is not None:
+                inner = text[opening.end():-len('</assistant>')]
+                if _ASSISTANT_TAG_RE.search(inner) is None:
+                    return inner.strip()
+        return _ASSISTANT_TAG_RE.sub('', text).strip()
 
     def _build_llm_history(self) -> History:
         """
-        内部の会話履歴(LPML)をLLMが要求するHistory形式に変換する。
+        内部の会話履歴(LPML)をLLMが要求するHistory形式で返す。
+        各メッセージは履歴追加時に変換済みのため、先頭のプロンプトのみを必要に応じて更新する。
         """
         # ベースプロンプト+ツール定義を、対話全体の指示として最初のuserメッセージに設定
-        history: History = [
-            Message(role="user", parts=[TextPart(text=self.prompt)])
-        ]
-
-        # 内部のLPML形式の会話履歴を、Messageオブジェクトのリストに変換
-        for element in self.conversation_history:
-            # LPML要素全体を文字列化してコンテンツとする
-            content_str = deparse([element])
-
-            if element["tag"] == "assistant":
-                role = "assistant"
-            elif element["tag"] == "system":
-                # システムからの通知（ツール結果など）はuserロールとして扱う
-                role = "user"
-            else:
-                logger.warning(f"Unsupported tag '{element['tag']}' skipped.")
-                continue
-
-            history.append(
-                Message(role=role, parts=[TextPart(text=content_str)])
+        prompt = self.prompt
+        head = self._history_cache[0]
+        if not head.parts or head.parts[0].text is not prompt:
+            self._history_cache[0] = Message(
+                role="user", parts=[TextPart(text=prompt)]
             )
-
-        return history
+        return self._history_cache
 
     async def start(self, initial_task: Optional[str] = None,
                     max_turns: int = 10, turn_sleep: float = 5.0):
@@ -130,28 +194,37 @@ class Context:
         )
         self.state = ContextState.RUNNING
 
-        initial_message = f"context id: {self.id}"
-        if self.parent_id:
-            initial_message += f"\nparent id: {self.parent_id}"
+        initial_message = self._initial_prefix
         if initial_task is not None:
             initial_message += f"\nTask: {initial_task}"
 
         self.turn_count = 1
+        self._refresh_timestamp()
         self._add_to_history("system", initial_message)
 
+        loop = asyncio.get_running_loop()
+        # 次のLLM呼び出しを許可する時刻。ターン間の待機はツール実行と並行して消化する
+        next_turn_at = 0.0
+
         while self.turn_count <= max_turns and self.state != ContextState.TERMINATED:
             turn_info = f"--- Context '{self.id}' | Turn {self.turn_count}/{max_turns} ---"
             logger.info(turn_info)
 
-            if self.turn_count > 1 and turn_sleep > 0:
+            remaining = next_turn_at - loop.time()
+            if remaining > 0:
                 logger.info(
-                    f"Sleeping for {turn_sleep} second(s) before next turn."
+                    f"Sleeping for {remaining:.2f} second(s) before next turn."
                 )
-                await asyncio.sleep(turn_sleep)
+                await asyncio.sleep(remaining)
 
             # 1. LLMに渡すための対話履歴を構築し、応答を生成させる
             history = self._build_llm_history()
-            llm_response_message = await self.llm.generate(history)
+            llm_response_message = await self.llm.generate(
+                history, exclude=self.system.get_parse_exclude()
+            )
+            next_turn_at = loop.time() + turn_sleep
+            # このターンで追加する履歴要素は、応答受信時のタイムスタンプを共有する
+            self._refresh_timestamp()
 
             # 2. LLMの応答(Message)からテキストを抽出し、サニタイズして履歴に追加
             if (llm_response_message.parts and
@@ -162,74 +235,73 @@ class Context:
                 llm_response_str = "<error>LLM response is empty or invalid.</error>"
 
             sanitized_response = self._sanitize_llm_response(llm_response_str)
-            logger.info(f"Assistant Response:\n{sanitized_response}")
+            # 応答は数KBに及ぶため、INFOが無効な場合は文字列の構築自体を省く
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"Assistant Response:\n{sanitized_response}")
             self._add_to_history("assistant", sanitized_response)
 
-            # 3. 応答をパースして<finish>をチェック
-            try:
-                response_tree = parse(sanitized_response)
-            except Exception as e:
-                logger.error(f"Failed to parse LLM response: {e}", exc_info=True)
-                response_tree = []
-
-            if findall(response_tree, "finish") and False:
-                logger.info("'<finish>' tag found. Context is terminating.")
-                self.state = ContextState.TERMINATED
-                continue
+            # 3. 応答をパースして<wait>の判定に備える
+            # 停止タグが含まれない応答では、パース自体を省略する
+            response_tree = []
+            if _STOP_TAG_RE.search(sanitized_response):
+                try:
+                    response_tree = parse(sanitized_response)
+                except Exception as e:
+                    logger.error(f"Failed to parse LLM response: {e}", exc_info=True)
 
             # 4. Systemにツール実行を依頼
             num_tasks = await self.system.process_llm_output(sanitized_response)
 
             # 5. ツール実行結果を待機・収集
+            # 既に結果が届いている場合は待機せず、そのまま取り出す
             all_results = []
-            if num_tasks > 0 or not self.system.result_queue.empty():
+            if num_tasks > 0 and self.system.result_queue.empty():
                 logger.info("Waiting for tool results...")
                 try:
-                    first_result = await asyncio.wait_for(
-                        self.system.result_queue.get(), timeout=30.0
-                    )
+                    async with asyncio.timeout(30.0):
+                        first_result = await self.system.result_queue.get()
                     all_results.append(first_result)
-                    self.system.result_queue.task_done()
-                except asyncio.TimeoutError:
+                except TimeoutError:
                     logger.warning("Timeout waiting for the first tool result.")
 
-                while not self.system.result_queue.empty():
-                    result = self.system.result_queue.get_nowait()
-                    all_results.append(result)
-                    self.system.result_queue.task_done()
+            if num_tasks > 0:
+                # 実行中の他のツールの結果も同じターンで受け取れるよう、短い猶予を設ける
+                await self.system.join_micro_batch(timeout=0.05)
+            all_results.extend(self.system.drain_results())
 
             # 6. ツール結果があれば履歴に追加して次のターンへ
             if all_results:
                 logger.info(
                     f"Drained {len(all_results)} result(s) from the queue."
                 )
-                results_elements = sum(
-                    [[x, '\n\n'] for x in all_results], []
-                )[:-1]
-                tool_results_lpml = deparse(results_elements)
-
-                logger.info(
-                    "System Response (Tool/Message Results):\n"
-                    f"{tool_results_lpml}"
+                tool_results_lpml = '\n\n'.join(
+                    deparse_one(result) for result in all_results
                 )
+
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info(
+                        "System Response (Tool/Message Results):\n"
+                        f"{tool_results_lpml}"
+                    )
                 self.turn_count += 1
                 self._add_to_history("system", tool_results_lpml)
                 continue
 
             # 7. <wait>タグをチェック
-            if findall(response_tree, "wait"):
+            # 最初の<wait>が見つかった時点で走査を打ち切る
+            if next(iterfindall(response_tree, "wait"), None) is not None:
                 logger.info(
                     "'<wait>' tag found. Context is WAITING for the next message."
                 )
                 self.state = ContextState.WAITING
                 try:
                     new_message = await self.system.result_queue.get()
-                    self.system.result_queue.task_done()
                     logger.info(f"Context '{self.id}' awakened by a new message.")
+                    self._refresh_timestamp()
                     self.state = ContextState.RUNNING
 
                     self.turn_count += 1
-                    self._add_to_history("system", deparse([new_message]))
+                    self._add_to_history("system", deparse_one(new_message))
                     continue
                 except asyncio.CancelledError:
                     logger.warning(f"Wait in context '{self.id}' was cancelled.")
@@ -254,6 +326,10 @@ class Context:
             )
             self.state = ContextState.TERMINATED
 
+        # 終了したコンテクストはManagerに残り続けるが、LLMを再び呼ぶことはない。
+        # LLM向けに文字列化した履歴の複製はここで解放する。
+        self._history_cache = [Message(role="user")]
+
         logger.info(
             f"--- Context loop finished for '{self.id}' with state: "
             f"{self.state.name} ---"
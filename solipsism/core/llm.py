@@ -2,14 +2,17 @@ import asyncio
 import logging
 import os
 import random
+import re
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Union
+from typing import Any, Collection, Dict, List, Optional, Union
 
 from dotenv import load_dotenv
 from google import genai
 from google.api_core import exceptions as google_exceptions
 
+from .lpml import find_top_level_tag
+
 # .envファイルから環境変数を読み込む
 load_dotenv()
 # ロガーの設定
@@ -57,6 +60,24 @@ class Message:
 # 対話履歴を表す型のエイリアス
 History = List[Message]
 
+# 応答の生成を打ち切ってよい停止タグ
+_STOP_TAGS = ("wait", "finish")
+# 停止タグの候補。見つかった場合のみ、応答全体を走査してトップレベルかどうかを確かめる
+_STOP_TAG_RE = re.compile(r'<(?:wait|finish)\b[^<>]*/>|</(?:wait|finish)>')
+# 停止タグの最大長。ストリーム走査時にチャンク境界をまたぐ分だけ遡る
+_STOP_TAG_LOOKBACK = 64
+
+# APIキーごとに共有するクライアント。コンテクスト間でHTTP接続プールを再利用する
+_CLIENTS: Dict[str, Any] = {}
+
+
+def _get_client(api_key: str) -> Any:
+    """APIキーに対応する共有genai.Clientを返す。未作成の場合は生成する。"""
+    client = _CLIENTS.get(api_key)
+    if client is None:
+        client = _CLIENTS[api_key] = genai.Client(api_key=api_key)
+    return client
+
 
 class BaseLLM(ABC):
     """
@@ -66,13 +87,17 @@ class BaseLLM(ABC):
     """
 
     @abstractmethod
-    async def generate(self, history: History) -> Message:
+    async def generate(self, history: History,
+                       exclude: Optional[Collection[str]] = None) -> Message:
         """与えられたメッセージ履歴に基づいてLLMからの応答を生成します。
 
         このメソッドは、具象クラスで必ず実装されなければなりません。
 
         Args:
             history (History): LLMに送信する対話履歴。
+            exclude (Collection[str], optional): 応答のパース時に内容を解析しない
+                タグの集合。応答を途中で打ち切る実装は、これらのタグの内側の
+                停止タグを無視しなければならない。
 
         Returns:
             Message: LLMからの応答メッセージ。
@@ -106,6 +131,8 @@ class GeminiLLM(BaseLLM):
         max_retries: int = 3,
         timeout: float = 180.0,
         backoff_factor: float = 2.0,
+        backoff_cap: float = 60.0,
+        stop_on_tags: bool = True,
     ):
         """GeminiLLMのインスタンスを初期化します。
 
@@ -119,8 +146,13 @@ class GeminiLLM(BaseLLM):
             max_retries (int, optional): リトライの最大回数。 Defaults to 3.
             timeout (float, optional): API呼び出しのタイムアウト秒数。
                 Defaults to 180.0.
-            backoff_factor (float, optional): リトライ時の待機時間スケーリング係数。
+            backoff_factor (float, optional): リトライ時の最小待機秒数。
                 Defaults to 2.0.
+            backoff_cap (float, optional): リトライ時の最大待機秒数。
+                Defaults to 60.0.
+            stop_on_tags (bool, optional): 応答をストリーミングで受信し、
+                トップレベルの`<wait>`/`<finish>`タグが閉じた時点で生成を
+                打ち切るかどうか。 Defaults to True.
 
         Raises:
             ValueError: 環境変数 'GEMINI_API_KEY' が設定されていない場合。
@@ -128,15 +160,21 @@ class GeminiLLM(BaseLLM):
         api_key = os.environ.get("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("Environment variable 'GEMINI_API_KEY' not set.")
-        self.client = genai.Client(api_key=api_key)
+        self.client = _get_client(api_key)
         self.model = model
         self.temperature = temperature
         self.thinking_budget = thinking_budget
         self.max_retries = max_retries
         self.timeout = timeout
         self.backoff_factor = backoff_factor
+        self.backoff_cap = backoff_cap
+        self.stop_on_tags = stop_on_tags
+        # 待機時間のジッター用の乱数生成器。グローバルな乱数状態を共有しない
+        self._rng = random.Random()
         # アップロード済みファイルをパスをキーにキャッシュする
         self.files: Dict[str, Any] = {}
+        # アップロード中のファイル。完了すると取り除かれ、結果はself.filesに残る
+        self._uploads: Dict[str, asyncio.Task] = {}
 
     def _upload_file(self, path: str, mime_type: str = None) -> Any:
         """ファイルをアップロードし、結果をキャッシュします。
@@ -162,6 +200,71 @@ class GeminiLLM(BaseLLM):
         self.files[path] = file
         return file
 
+    def prefetch_file(self, path: str, mime_type: str = None) -> asyncio.Task:
+        """ファイルのアップロードをバックグラウンドで開始します。
+
+        ファイルを添付することが分かった時点で呼び出しておくと、
+        generateの呼び出し時にはアップロードが完了していることが期待できます。
+        同じパスのアップロードが進行中の場合は、そのタスクを返します。
+
+        Args:
+            path (str): アップロードするファイルのパス。
+            mime_type (str, optional): ファイルのMIMEタイプ。 Defaults to None.
+
+        Returns:
+            asyncio.Task: アップロードされたファイルオブジェクトを返すタスク。
+        """
+        task = self._uploads.get(path)
+        if task is None:
+            task = asyncio.create_task(
+                asyncio.to_thread(self._upload_file, path, mime_type)
+            )
+            self._uploads[path] = task
+            task.add_done_callback(
+                lambda t: self._on_upload_done(path, t)
+            )
+        return task
+
+    def _on_upload_done(self, path: str, task: asyncio.Task):
+        """アップロードタスクの完了時に進行中の一覧から取り除き、失敗を記録します。"""
+        self._uploads.pop(path, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Failed to upload file '{path}': {task.exception()}")
+
+    async def _upload_file_async(self, path: str, mime_type: str = None) -> Any:
+        """ファイルを別スレッドでアップロードします。キャッシュ済みの場合は即座に返します。
+
+        prefetch_fileで開始済みのアップロードがあれば、その完了を待ちます。
+
+        Args:
+            path (str): アップロードするファイルのパス。
+            mime_type (str, optional): ファイルのMIMEタイプ。 Defaults to None.
+
+        Returns:
+            Any: アップロードされたファイルオブジェクト。
+        """
+        if path in self.files:
+            return self.files[path]
+        return await self.prefetch_file(path, mime_type)
+
+    async def _prefetch_files(self, history: History):
+        """履歴中の未アップロードのファイルを重複なく集め、並行してアップロードします。
+
+        Args:
+            history (History): 対象の対話履歴。
+        """
+        pending: Dict[str, str] = {}
+        for message in history:
+            for part in message.parts:
+                if (isinstance(part, FilePart) and part.path not in self.files
+                        and part.path not in pending):
+                    pending[part.path] = part.mime_type
+        if pending:
+            await asyncio.gather(*(
+                self._upload_file_async(path, mime_type)
+                for path, mime_type in pending.items()
+            ))
+
     def _convert_message(self, message: Message) -> Dict[str, Any]:
         """汎用的なMessageオブジェクトを、Gemini APIが要求する辞書形式に変換します。
 
@@ -178,7 +281,7 @@ class GeminiLLM(BaseLLM):
             if isinstance(part, TextPart):
                 message_gemini["parts"].append(genai.types.Part(text=part.text))
             elif isinstance(part, FilePart):
-                # ファイルアップロードは同期的で時間がかかる処理
+                # 通常は_prefetch_filesでアップロード済みのため、キャッシュから取得される
                 file = self._upload_file(part.path, part.mime_type)
                 file_part = genai.types.Part.from_uri(
                     file_uri=file.uri,
@@ -199,19 +302,75 @@ class GeminiLLM(BaseLLM):
         """
         return [self._convert_message(msg) for msg in history]
 
-    async def generate(self, history: History) -> Message:
+    async def _generate_text(self, gemini_history: List[Dict[str, Any]],
+                             config: Any,
+                             exclude: Optional[Collection[str]] = None) -> str:
+        """
+        応答をストリーミングで受信し、停止タグが現れた時点で打ち切ってテキストを返す。
+
+        停止タグ以降のトークンは履歴にもツール実行にも使われないため、
+        残りの生成を待たずにストリームを閉じる。打ち切るのはトップレベルの
+        停止タグのみで、ツールタグの本文などの要素の内側にあるものは無視する。
+
+        Args:
+            gemini_history (List[Dict[str, Any]]): Gemini API形式の対話履歴。
+            config (Any): 生成設定。
+            exclude (Collection[str], optional): パース時に内容を解析しないタグの集合。
+
+        Returns:
+            str: 停止タグまで（タグを含む）の応答テキスト。
+        """
+        stream = await self.client.aio.models.generate_content_stream(
+            model=f"models/{self.model}",
+            contents=gemini_history,
+            config=config,
+        )
+        chunks: List[str] = []
+        window = ""
+        try:
+            async for chunk in stream:
+                text = chunk.text
+                if not text:
+                    # 思考のみのチャンクなどはテキストを持たない
+                    continue
+                chunks.append(text)
+                # チャンク境界をまたぐタグを取りこぼさないよう、直前の末尾も含めて走査する
+                window = window[-_STOP_TAG_LOOKBACK:] + text
+                if _STOP_TAG_RE.search(window) is None:
+                    continue
+                # 候補があれば、パーサと同じ規則で要素の外側にあるかを確かめる
+                received = "".join(chunks)
+                span = find_top_level_tag(received, _STOP_TAGS, exclude)
+                if span is not None:
+                    chunks = [received[:span[1]]]
+                    logger.info("Stop tag received. Closing the response stream early.")
+                    break
+        finally:
+            await stream.aclose()
+        return "".join(chunks)
+
+    async def generate(self, history: History,
+                       exclude: Optional[Collection[str]] = None) -> Message:
         """
         タイムアウトと指数バックオフによるリトライロジックを備えたLLM応答生成。
 
+        待機時間は直前の待機時間に基づいてランダムに決める（decorrelated jitter）。
+        複数のコンテクストが同時にエラーを受けても、リトライの時刻が揃いにくい。
+
         Args:
             history (History): LLMに送信する対話履歴。
+            exclude (Collection[str], optional): 応答のパース時に内容を解析しないタグの集合。
+                停止タグによる打ち切りの判定に用いる。
 
         Returns:
             Message: LLMからの応答。エラーが発生した場合はエラー情報を含む。
         """
         gemini_history = None
+        delay = self.backoff_factor
         try:
-            # ファイルアップロードを含む変換処理は同期的で重いため、
+            # 未アップロードのファイルは事前にまとめて並行アップロードしておく
+            await self._prefetch_files(history)
+            # 変換処理は長い履歴では重いため、
             # asyncio.to_threadで別スレッドで実行し、イベントループをブロックしない。
             gemini_history = await asyncio.to_thread(
                 self._convert_history, history
@@ -229,21 +388,24 @@ class GeminiLLM(BaseLLM):
 
         for attempt in range(self.max_retries + 1):
             try:
-                api_call = self.client.aio.models.generate_content(
-                    model=f"models/{self.model}",
-                    contents=gemini_history,
-                    config=genai.types.GenerateContentConfig(
-                        temperature=self.temperature,
-                        thinking_config=genai.types.ThinkingConfig(
-                            thinking_budget=self.thinking_budget
-                        ),
+                config = genai.types.GenerateContentConfig(
+                    temperature=self.temperature,
+                    thinking_config=genai.types.ThinkingConfig(
+                        thinking_budget=self.thinking_budget
                     ),
                 )
-
-                response = await asyncio.wait_for(api_call, timeout=self.timeout)
-                return Message(
-                    role="assistant", parts=[TextPart(text=response.text)]
-                )
+                if self.stop_on_tags:
+                    api_call = self._generate_text(gemini_history, config, exclude)
+                    text = await asyncio.wait_for(api_call, timeout=self.timeout)
+                else:
+                    api_call = self.client.aio.models.generate_content(
+                        model=f"models/{self.model}",
+                        contents=gemini_history,
+                        config=config,
+                    )
+                    response = await asyncio.wait_for(api_call, timeout=self.timeout)
+                    text = response.text
+                return Message(role="assistant", parts=[TextPart(text=text)])
 
             except asyncio.TimeoutError:
                 msg = (
@@ -271,11 +433,12 @@ class GeminiLLM(BaseLLM):
                 )
 
             if attempt < self.max_retries:
-                delay = self.backoff_factor * (2 ** attempt)
-                jitter = random.uniform(0, 1)
-                sleep_time = delay + jitter
-                logger.info(f"Retrying in {sleep_time:.2f} seconds...")
-                await asyncio.sleep(sleep_time)
+                delay = min(
+                    self.backoff_cap,
+                    self._rng.uniform(self.backoff_factor, delay * 3)
+                )
+                logger.info(f"Retrying in {delay:.2f} seconds...")
+                await asyncio.sleep(delay)
 
         final_error_msg = (
             "<error>Failed to get response from LLM after multiple "
@@ -1,11 +1,35 @@
 import re
-import uuid
-from typing import List, Dict, Union, Optional
+from dataclasses import dataclass
+from typing import Collection, Iterable, Iterator, List, Dict, Tuple, Union, Optional
+
+try:
+    # Optional: RE2 matches in linear time, so malformed input such as a long
+    # run of '<a<a<a...' cannot make tag scanning quadratic.
+    import re2 as _tag_engine
+except ImportError:
+    _tag_engine = re
 
 
 Attributes = Dict[str, str]
 Element = Dict[str, Union[str, Attributes, List['Element']]]
-LPMLTree = List[Union[str, Element]]
+
+
+@dataclass(slots=True)
+class HistoryElement:
+    """A conversation history entry with fixed `turn` and `timestamp` attributes.
+
+    Kept as a slotted object rather than an Element dict so that long
+    histories stay compact. `content` holds the bare payload; `deparse`
+    renders it on its own lines, i.e. like an Element whose content is
+    wrapped in newlines.
+    """
+    tag: str
+    turn: int
+    timestamp: str
+    content: str
+
+
+LPMLTree = List[Union[str, Element, HistoryElement]]
 
 
 PATTERN_ATTRIBUTE = r''' ([^"'/<> -]+)=(?:"([^"]*)"|'([^']*)')'''
@@ -16,73 +40,147 @@ PATTERN_TAG_EMPTY = rf'<([^/>\s\n]+)((?:{PATTERN_ATTRIBUTE_NO_CAPTURE})*)\s*/>'
 PATTERN_TAG = rf'({PATTERN_TAG_START}|{PATTERN_TAG_END}|{PATTERN_TAG_EMPTY})'
 PATTERN_BACKTICK = r'`(.*?)`'
 
+# The characters matched by `\s` in Python's `re`, spelled out because RE2's
+# `\s` only covers ASCII whitespace. Both engines thus accept the same tags.
+_WHITESPACE = (
+    '\t-\r\x1c-\x1f \x85\xa0\u1680\u2000-\u200a'
+    '\u2028\u2029\u202f\u205f\u3000'
+)
+
+_ATTRIBUTE_RE = _tag_engine.compile(PATTERN_ATTRIBUTE)
+# Same alternation as PATTERN_TAG, with named groups so that a single match
+# tells which kind of tag was found and yields its name and attributes.
+_TAG_RE = _tag_engine.compile(
+    rf'<(?P<start>[^/>{_WHITESPACE}]+)(?P<start_attr>(?:{PATTERN_ATTRIBUTE_NO_CAPTURE})*)[{_WHITESPACE}]*>'
+    rf'|</(?P<end>[^/>{_WHITESPACE}]+)[{_WHITESPACE}]*>'
+    rf'|<(?P<empty>[^/>{_WHITESPACE}]+)(?P<empty_attr>(?:{PATTERN_ATTRIBUTE_NO_CAPTURE})*)[{_WHITESPACE}]*/>'
+)
+_BACKTICK_RE = re.compile(PATTERN_BACKTICK, re.DOTALL)
+# Placeholder for protected (backticked) content: an index delimited by NUL.
+# Text that already contains NUL gets another delimiter (see _pick_sentinel).
+_PLACEHOLDER_RE = re.compile('\x00(\\d+)\x00')
+# A start or empty tag cut off inside a quoted attribute value. Such a quote may
+# still hide '<' and '>' once the rest of the text arrives.
+_OPEN_ATTRIBUTE_RE = re.compile(
+    rf'<[^/>{_WHITESPACE}]+(?:{PATTERN_ATTRIBUTE_NO_CAPTURE})* [^"\'/<> -]+=(?:"[^"]*|\'[^\']*)$'
+)
+# A (possibly empty) run of tag-name characters, used to skip failed tags.
+_TAG_NAME_RE = re.compile(f'[^/>{_WHITESPACE}]*')
+
+
+def _scan_tags(text: str) -> Iterator[re.Match]:
+    """Yield the tag matches in `text`, like `_TAG_RE.finditer(text)`.
+
+    Candidates are located with `str.find('<')` and matched in place. When a
+    candidate fails, every '<' inside its tag name would fail the same way
+    (the name ends at the same character), so the scan resumes after it.
+    This keeps malformed input such as '<a<a<a...' linear, where `finditer`
+    on the backtracking `re` engine is quadratic.
+    """
+    find = text.find
+    match = _TAG_RE.match
+    pos = find('<')
+    while pos >= 0:
+        m = match(text, pos)
+        if m is not None:
+            yield m
+            pos = find('<', m.end())
+        elif text.startswith('</', pos):
+            pos = find('<', pos + 1)
+        else:
+            # The last name character may still open an end tag ('<' + '/')
+            name_end = _TAG_NAME_RE.match(text, pos + 1).end()
+            pos = find('<', max(pos + 1, name_end - 1))
+
+
+# RE2 already scans in linear time, so its own finditer is used as is.
+_iter_tags = _scan_tags if _tag_engine is re else _TAG_RE.finditer
+
 
 def _parse_attributes(text: str) -> Attributes:
     attributes: Attributes = {}
-    for k, v1, v2 in re.findall(PATTERN_ATTRIBUTE, text):
+    for k, v1, v2 in _ATTRIBUTE_RE.findall(text):
         attributes[k] = v1 or v2
     return attributes
 
 
+def _pick_sentinel(text: str) -> str:
+    """Return a placeholder delimiter that does not occur in text."""
+    if '\x00' not in text:
+        return '\x00'
+    # Use the first private-use character the text does not contain
+    used = set(text)
+    for code in range(0xE000, 0x110000):
+        if chr(code) not in used:
+            return chr(code)
+    raise ValueError('No unused character left to delimit placeholders.')
+
+
 def _restore_protected_content(
-        tree: LPMLTree, protected: Dict[str, str]) -> LPMLTree:
-    """Recursively traverse the tree and restore placeholders."""
-    restored_tree: LPMLTree = []
-    for item in tree:
-        if isinstance(item, str):
-            # Restore all placeholders found in the string content
-            for placeholder, original in protected.items():
-                item = item.replace(placeholder, original)
-            restored_tree.append(item)
-        elif isinstance(item, dict):
-            if isinstance(item['content'], list):
-                item['content'] = _restore_protected_content(
-                    item['content'], protected)
-            restored_tree.append(item)
-    return restored_tree
+        tree: LPMLTree, protected: List[str],
+        sentinel: str = '\x00') -> LPMLTree:
+    """Restore placeholders in the tree in place and return the same tree."""
+    if sentinel == '\x00':
+        placeholder_re = _PLACEHOLDER_RE
+    else:
+        placeholder_re = re.compile(f'{sentinel}(\\d+){sentinel}')
+
+    def restore_match(match):
+        return protected[int(match.group(1))]
+
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        for i, item in enumerate(node):
+            if isinstance(item, str):
+                # Restore all placeholders found in the string content in one pass
+                if sentinel in item:
+                    node[i] = placeholder_re.sub(restore_match, item)
+            elif isinstance(item['content'], list):
+                stack.append(item['content'])
+    return tree
 
 
 def parse(text: str, strip: bool = False, 
-          exclude: Optional[List[str]] = None) -> LPMLTree:
+          exclude: Optional[Collection[str]] = None) -> LPMLTree:
     """Parse LPML text.
 
     Args:
         text (str): The text to parse.
-        exclude (List[str]): Content of the specified tags will not be parsed.
+        exclude (Collection[str]): Content of the specified tags will not be
+            parsed.
 
     Returns:
         LPMLTree: The parsed tree.
     """
-    protected_content: Dict[str, str] = {}
+    protected_content: List[str] = []
+    sentinel = _pick_sentinel(text)
 
-    # 1. Protect phase: Replace backticked content with unique placeholders
+    # 1. Protect phase: Replace backticked content with indexed placeholders
     def protect_match(match):
-        # Generate a unique placeholder that is extremely unlikely to collide
-        placeholder = f"__PROTECTED_{uuid.uuid4().hex}__"
         # Store the original content (including backticks)
-        protected_content[placeholder] = match.group(0)
-        return placeholder
+        protected_content.append(match.group(0))
+        return f"{sentinel}{len(protected_content) - 1}{sentinel}"
 
-    text = re.sub(
-        PATTERN_BACKTICK, protect_match, text, flags=re.DOTALL)
+    text = _BACKTICK_RE.sub(protect_match, text)
 
-    if exclude is None:
-        exclude = []
+    # frozenset() of a frozenset returns it as is, so cached sets cost nothing
+    exclude = frozenset(exclude or ())
 
     tree: LPMLTree = []
 
     cursor = 0
     tag_exclude = None
     stack = [{'tag': 'root', 'content': tree}]
+    # Stack indices of the open elements, per tag name, kept in step with stack
+    open_indices: Dict[str, List[int]] = {}
 
-    for match in re.finditer(PATTERN_TAG, text):
+    for match in _iter_tags(text):
         tag = match.group(0)
-        match_tag_start = re.fullmatch(PATTERN_TAG_START, tag)
-        match_tag_end = re.fullmatch(PATTERN_TAG_END, tag)
-        match_tag_empty = re.fullmatch(PATTERN_TAG_EMPTY, tag)
+        name_start, name_end, name_empty = match.group('start', 'end', 'empty')
 
         if tag_exclude is not None:
-            if match_tag_end and match_tag_end.group(1) == tag_exclude:
+            if name_end == tag_exclude:
                 tag_exclude = None
             else:
                 continue
@@ -95,23 +193,24 @@ def parse(text: str, strip: bool = False,
             stack[-1]['content'].append(content_str)
         cursor = ind_tag_end
 
-        if match_tag_start:
-            name = match_tag_start.group(1)
+        if name_start is not None:
+            name = name_start
             if name in exclude:
                 tag_exclude = name
 
-            attributes = _parse_attributes(match_tag_start.group(2))
+            attributes = _parse_attributes(match.group('start_attr'))
             element: Element = {
                 'tag': name,
                 'attributes': attributes,
                 'content': []
             }
             stack[-1]['content'].append(element)
+            open_indices.setdefault(name, []).append(len(stack))
             stack.append(element)
 
-        elif match_tag_empty:
-            name = match_tag_empty.group(1)
-            attributes = _parse_attributes(match_tag_empty.group(2))
+        elif name_empty is not None:
+            name = name_empty
+            attributes = _parse_attributes(match.group('empty_attr'))
             element: Element = {
                 'tag': name,
                 'attributes': attributes,
@@ -119,16 +218,19 @@ def parse(text: str, strip: bool = False,
             }
             stack[-1]['content'].append(element)
 
-        elif match_tag_end:
-            name = match_tag_end.group(1)
-            for i in range(len(stack)-1, 0, -1):
-                if stack[i]['tag'] == name:
-                    ind_tag_start = i
-                    break
+        else:
+            name = name_end
+            indices = open_indices.get(name)
+            if indices:
+                # Close the innermost open element with this name, along with
+                # any elements still open inside it
+                i = indices[-1]
+                for element in reversed(stack[i:]):
+                    open_indices[element['tag']].pop()
+                del stack[i:]
             else:
                 print(f'Warning: Unmatched closing tag </{name}> found.')
                 stack[-1]['content'].append(tag)
-            stack = stack[:max(1, ind_tag_start)]
 
     content_str = text[cursor:]
     if strip:
@@ -140,21 +242,112 @@ def parse(text: str, strip: bool = False,
         tags_remain = [e["tag"] for e in stack][1:]
         print(f'Warning: Unclosed elements remain: {tags_remain}')
 
-    tree = _restore_protected_content(tree, protected_content)
+    if protected_content:
+        _restore_protected_content(tree, protected_content, sentinel)
     return tree
 
 
-def _repr_tag(tag, content, **kwargs):
-    if kwargs:
-        attr = ' ' + ' '.join([f'{k}="{v}"' for k, v in kwargs.items()])
-    else:
-        attr = ''
-    bra = f'<{tag}{attr}>'
-    ket = f'</{tag}>'
-    emp = f'<{tag}/>'
+def find_top_level_tag(text: str, tags: Collection[str],
+                       exclude: Optional[Collection[str]] = None
+                       ) -> Optional[Tuple[int, int]]:
+    """Find the first complete top-level element with one of `tags`.
+
+    `text` may be an incomplete prefix of a document, e.g. a response that is
+    still being streamed. Tags are tracked the way `parse` would see them, so
+    an element inside another element, inside the unparsed content of an
+    `exclude` tag, or inside backticks is not reported.
+
+    Args:
+        text (str): The (possibly incomplete) text to scan.
+        tags (Collection[str]): The tags to look for.
+        exclude (Collection[str]): Tags whose content is not parsed, as for
+            `parse`.
+
+    Returns:
+        Optional[Tuple[int, int]]: The span from the element's start tag to the
+            end of its closing (or empty) tag, or None if there is none yet.
+    """
+    # Mask backticked content with same-length filler so offsets still match.
+    # An unpaired backtick may pair with text that has not arrived yet, so
+    # nothing after it is final.
+    masked = _BACKTICK_RE.sub(lambda m: '\x00' * (m.end() - m.start()), text)
+    unpaired = masked.find('`')
+    if unpaired != -1:
+        masked = masked[:unpaired]
+
+    exclude = frozenset(exclude or ())
+    tag_exclude = None
+    # Open elements as (name, start offset), like the stack in `parse`
+    stack: List[Tuple[str, int]] = []
+    for match in _iter_tags(masked):
+        name_start, name_end, name_empty = match.group('start', 'end', 'empty')
+        if tag_exclude is not None:
+            if name_end == tag_exclude:
+                # The excluded element is always the innermost open one
+                tag_exclude = None
+                stack.pop()
+            continue
+
+        span = None
+        if name_start is not None:
+            if name_start in exclude:
+                tag_exclude = name_start
+            stack.append((name_start, match.start()))
+        elif name_empty is not None:
+            if not stack and name_empty in tags:
+                span = match.span()
+        else:
+            for i in range(len(stack) - 1, -1, -1):
+                if stack[i][0] == name_end:
+                    if i == 0 and name_end in tags:
+                        span = (stack[0][1], match.end())
+                    # Close the innermost open element with this name
+                    del stack[i:]
+                    break
+
+        if span is not None:
+            # A tag still being written may yet turn the text before this
+            # match into one of its quoted attribute values
+            if _OPEN_ATTRIBUTE_RE.search(masked, 0, span[0]):
+                return None
+            return span
+    return None
+
+
+def _repr_attributes(attributes: Attributes) -> str:
+    return ''.join([f' {k}="{v}"' for k, v in attributes.items()])
+
+
+def _repr_tag(tag, content, attributes: Attributes):
     if content is None:
-        return emp
-    return ''.join([bra, content, ket])
+        return f'<{tag}/>'
+    return f'<{tag}{_repr_attributes(attributes)}>{content}</{tag}>'
+
+
+def deparse_one(element: Union[str, Element, HistoryElement]) -> str:
+    """Deparse a single LPML item.
+
+    Equivalent to `deparse([element])` but skips the list walk, which is the
+    common case when rendering history entries and tool results.
+
+    Args:
+        element (Union[str, Element, HistoryElement]): The item to deparse.
+
+    Returns:
+        str: The deparsed text.
+    """
+    if isinstance(element, str):
+        return element
+    if isinstance(element, HistoryElement):
+        return (
+            f'<{element.tag} turn="{element.turn}" '
+            f'timestamp="{element.timestamp}">\n'
+            f'{element.content}\n</{element.tag}>'
+        )
+    content = element['content']
+    if not isinstance(content, str):
+        content = deparse(content)
+    return _repr_tag(element['tag'], content, element['attributes'])
 
 
 def deparse(tree: LPMLTree) -> str:
@@ -169,16 +362,50 @@ def deparse(tree: LPMLTree) -> str:
     if tree is None:
         return tree
 
-    text = ''
+    # Iterative walk: nested elements push their closing tag and children
+    # (in reverse) onto the stack, and all fragments are joined once.
+    parts: List[str] = []
+    stack = list(reversed(tree))
+    while stack:
+        element = stack.pop()
+        if isinstance(element, dict) and isinstance(element['content'], list):
+            tag = element['tag']
+            parts.append(f'<{tag}{_repr_attributes(element["attributes"])}>')
+            stack.append(f'</{tag}>')
+            stack.extend(reversed(element['content']))
+        else:
+            parts.append(deparse_one(element))
+    return ''.join(parts)
+
+
+def iterfindall(tree: LPMLTree, tag: str) -> Iterator[Element]:
+    """Iterate over all elements with the specified tag in document order.
 
-    for element in tree:
-        if isinstance(element, str):
-            text += element
-            continue
-        deparsed_content = deparse(element['content'])
-        text += _repr_tag(
-            element['tag'], deparsed_content, **element['attributes'])
-    return text
+    Args:
+        tree (LPMLTree): The tree to search.
+        tag (str): The tag to search for.
+
+    Yields:
+        Element: The elements with the specified tag.
+    """
+    if tree is None:
+        return
+
+    # Iterative pre-order traversal; keeps document order without recursion.
+    stack = [iter(tree)]
+    while stack:
+        for element in stack[-1]:
+            if not isinstance(element, dict):
+                if isinstance(element, HistoryElement) and element.tag == tag:
+                    yield element
+                continue
+            if element['tag'] == tag:
+                yield element
+            if isinstance(element['content'], list):
+                stack.append(iter(element['content']))
+                break
+        else:
+            stack.pop()
 
 
 def findall(tree: LPMLTree, tag: str) -> List[Element]:
@@ -191,16 +418,42 @@ def findall(tree: LPMLTree, tag: str) -> List[Element]:
     Returns:
         List[Element]: The list of elements with the specified tag.
     """
-    if tree is None:
-        return []
+    return list(iterfindall(tree, tag))
 
-    result = []
-    for element in tree:
-        if not isinstance(element, dict):
-            continue
-        if element['tag'] == tag:
-            result.append(element)
-        result += findall(element['content'], tag)
+
+def findall_multi(tree: LPMLTree,
+                  tags: Iterable[str]) -> Dict[str, List[Element]]:
+    """Find all elements for several tags in a single traversal.
+
+    Args:
+        tree (LPMLTree): The tree to search.
+        tags (Iterable[str]): The tags to search for.
+
+    Returns:
+        Dict[str, List[Element]]: The elements found for each tag, in document
+            order. Tags without any match are omitted.
+    """
+    tags = frozenset(tags)
+    result: Dict[str, List[Element]] = {}
+    if tree is None:
+        return result
+
+    stack = [iter(tree)]
+    while stack:
+        for element in stack[-1]:
+            if isinstance(element, dict):
+                tag = element['tag']
+            elif isinstance(element, HistoryElement):
+                tag = element.tag
+            else:
+                continue
+            if tag in tags:
+                result.setdefault(tag, []).append(element)
+            if isinstance(element, dict) and isinstance(element['content'], list):
+                stack.append(iter(element['content']))
+                break
+        else:
+            stack.pop()
     return result
 
 
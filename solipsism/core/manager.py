@@ -1,5 +1,4 @@
 import asyncio
-import inspect
 import logging
 from typing import Any, Dict, List, Optional, Type
 
@@ -7,7 +6,7 @@ from ..tools.manager_tools import CreateContextTool, SendTool
 from .context import Context
 from .llm import GeminiLLM
 from .system import System
-from .tool import BaseTool
+from .tool import BaseTool, get_init_param_names
 
 logger = logging.getLogger(__name__)
 
@@ -52,12 +51,19 @@ class Manager:
         )
         new_system = System()
 
-        for tool_name in tool_names:
+        # 必須ツールは下で必ず追加されるため、ここではインスタンス化しない。
+        # 重複指定されたツールも一度だけインスタンス化する。
+        essential_tools = (SendTool(self), CreateContextTool(self))
+        essential_names = {tool.name for tool in essential_tools}
+
+        for tool_name in dict.fromkeys(tool_names):
+            if tool_name in essential_names:
+                continue
             if tool_name in self.tool_catalog:
                 tool_class = self.tool_catalog[tool_name]
                 try:
-                    sig = inspect.signature(tool_class.__init__)
-                    if 'manager' in sig.parameters:
+                    # 引数名はカタログ登録時にクラスへキャッシュされている
+                    if 'manager' in get_init_param_names(tool_class):
                         instance = tool_class(manager=self)
                     else:
                         instance = tool_class("./")
@@ -73,23 +79,23 @@ class Manager:
                 )
 
         # These tools are essential and always added with correct dependencies.
-        new_system.add_tool(SendTool(self))
-        new_system.add_tool(CreateContextTool(self))
+        for tool in essential_tools:
+            new_system.add_tool(tool)
 
         final_prompt_path = (
             prompt_path or "./solipsism/prompts/root_prompt.lpml"
         )
 
+        if custom_id and self.get_context(custom_id):
+            raise ValueError(f"Context ID '{custom_id}' already exists.")
+
         new_context = Context(
             llm=new_llm,
             system=new_system,
             base_prompt_path=final_prompt_path,
-            parent_id=parent_id
+            parent_id=parent_id,
+            context_id=custom_id
         )
-        if custom_id:
-            if self.get_context(custom_id):
-                raise ValueError(f"Context ID '{custom_id}' already exists.")
-            new_context.id = custom_id
 
         parent_context = self.get_context(parent_id)
         if parent_context:
@@ -138,6 +144,8 @@ class Manager:
             )
             return False
 
+        # 送信元が共有ファイルシステムを変更している可能性があるため、受信側のキャッシュを破棄する
+        to_context.system.tool_cache.clear()
         await to_context.system.result_queue.put(element)
         logger.info(f"Element routed from '{from_id}' to '{to_id}'.")
         return True
@@ -1,13 +1,62 @@
 import asyncio
+import hashlib
+import json
 import logging
-from typing import Dict, List, Optional
+import time
+from typing import Dict, FrozenSet, Hashable, List, Optional, Set, Tuple
 
-from .lpml import Element, deparse, findall, parse
+from .lpml import Element, deparse_one, findall_multi, parse
 from .tool import BaseTool
 
 logger = logging.getLogger(__name__)
 
 
+class ToolResultCache:
+    """
+    ツールの実行結果を (ツール名, 引数) をキーとしてTTL付きで保持するキャッシュ。
+    各エントリには格納時のスタンプ（ファイルのmtimeなど）を添え、取得時と一致する場合のみ返す。
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[float, Hashable, Element]] = {}
+
+    @staticmethod
+    def _make_key(tool_name: str, element: Element) -> str:
+        """ツール名と要素の属性・内容を正規化したJSONからキーを生成する。"""
+        args = json.dumps(
+            [tool_name, element.get("attributes", {}), element.get("content")],
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.blake2b(args.encode(), digest_size=16).hexdigest()
+
+    def get(self, tool_name: str, element: Element,
+            stamp: Hashable = None) -> Optional[Element]:
+        """
+        有効期限内かつスタンプが一致するキャッシュ済み結果を返す。
+        存在しなければNoneを返す。
+        """
+        key = self._make_key(tool_name, element)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, cached_stamp, result = entry
+        if time.monotonic() >= expires_at or cached_stamp != stamp:
+            del self._entries[key]
+            return None
+        return result
+
+    def put(self, tool_name: str, element: Element, result: Element,
+            ttl: float, stamp: Hashable = None):
+        """実行結果を、実行前に取得したスタンプとともにキャッシュに格納する。"""
+        if ttl <= 0:
+            return
+        key = self._make_key(tool_name, element)
+        self._entries[key] = (time.monotonic() + ttl, stamp, result)
+
+    def clear(self):
+        self._entries.clear()
+
+
 class System:
     """LLMの出力に応じたツールの実行を管理するクラス"""
 
@@ -15,6 +64,14 @@ class System:
         self.tools: Dict[str, BaseTool] = {}
         self.result_queue: asyncio.Queue[Element] = asyncio.Queue()
         self.context_id: Optional[str] = None  # どのコンテクストに属しているかを保持
+        self.tool_cache = ToolResultCache()
+        self.tools_version = 0  # ツール構成が変化するたびに加算される
+        self._definitions_cache = ""
+        self._definitions_version = 0
+        self._exclude_cache: FrozenSet[str] = frozenset()
+        self._exclude_version = -1
+        # 実行中のツールタスク。完了時に自動で取り除かれる
+        self._pending_tasks: Set[asyncio.Task] = set()
         logger.info("System initialized.")
 
     def add_tool(self, tool: BaseTool):
@@ -25,61 +82,109 @@ class System:
 
         tool.system = self  # ツールにシステムインスタンスを渡す
         self.tools[tool.name] = tool
+        self.tools_version += 1
         logger.info(f"Tool '{tool.name}' has been added.")
 
     def get_tool_definitions(self):
-        definitions = ""
-        for name, tool in self.tools.items():
-            definitions += tool.definition + "\n\n"
-        return definitions.strip()
+        """登録済みツールの定義を結合して返す。ツール構成が変化するまで結果を再利用する。"""
+        if self._definitions_version != self.tools_version:
+            self._definitions_cache = "\n\n".join(
+                tool.definition for tool in self.tools.values()
+            ).strip()
+            self._definitions_version = self.tools_version
+        return self._definitions_cache
+
+    def get_parse_exclude(self) -> FrozenSet[str]:
+        """
+        パース時に内容を解析しないタグの集合を返す。
+        ツール構成が変化するまで結果を再利用する。
+        """
+        if self._exclude_version != self.tools_version:
+            self._exclude_cache = frozenset(
+                ["define_tag", "rule", "send", "code"] +
+                [key for key in self.tools if key != 'create_context']
+            )
+            self._exclude_version = self.tools_version
+        return self._exclude_cache
 
     async def process_llm_output(self, lpml_string: str) -> int:
         """
         LLMの出力をパースし、対応するツールを実行する。
-        実行をスケジュールしたタスクの数を返す。
+        実行をスケジュールしたタスクの数（キャッシュから応答した分を含む）を返す。
         """
         logger.info("Processing LLM output for tool execution...")
         try:
-            exclude = ["define_tag", "rule", "send", "code"]
-            exclude += [key for key in self.tools.keys() if key != 'create_context']
-            tree = parse(lpml_string, exclude=exclude)
+            tree = parse(lpml_string, exclude=self.get_parse_exclude())
         except Exception as e:
             logger.error(f"Failed to parse LPML string: {e}", exc_info=True)
             return 0
 
+        # 木を一度だけ走査してツール名ごとに要素を振り分け、登録順に並べる
+        found = findall_multi(tree, self.tools)
+        calls = [
+            (tool, element)
+            for tag_name, tool in self.tools.items()
+            for element in found.get(tag_name, ())
+        ]
+
+        # 副作用を持ちうるツールが含まれる場合、古い結果を返さないようキャッシュを破棄する
+        if any(not tool.CACHEABLE for tool, _ in calls):
+            self.tool_cache.clear()
+
         tasks_to_run = []
-        for tag_name, tool in self.tools.items():
-            tool_elements = findall(tree, tag_name)
-            for element in tool_elements:
-                logger.info(f"Found tool tag: <{tag_name}>. Scheduling execution.")
-                task = asyncio.create_task(tool.run(element))
-                tasks_to_run.append(task)
-
-        if tasks_to_run:
-            num_tasks = len(tasks_to_run)
+        num_cache_hits = 0
+        for tool, element in calls:
+            if tool.CACHEABLE:
+                cached = self.tool_cache.get(
+                    tool.name, element, tool.cache_stamp(element))
+                if cached is not None:
+                    logger.info(
+                        f"Cache hit for tool tag: <{tool.name}>. Skipping execution.")
+                    self.result_queue.put_nowait(cached)
+                    num_cache_hits += 1
+                    continue
+            logger.info(f"Found tool tag: <{tool.name}>. Scheduling execution.")
+            task = asyncio.create_task(tool.run(element))
+            self._pending_tasks.add(task)
+            task.add_done_callback(self._pending_tasks.discard)
+            tasks_to_run.append(task)
+
+        if tasks_to_run or num_cache_hits:
+            num_tasks = len(tasks_to_run) + num_cache_hits
             logger.info(f"Scheduled {num_tasks} tool(s) to run in the background.")
             return num_tasks
         else:
             logger.info("No tool tags found in the LLM output.")
             return 0
 
-    async def get_tool_results_as_lpml(self) -> Optional[str]:
+    async def join_micro_batch(self, timeout: float = 0.05):
         """
-        結果キューに溜まったツール実行結果をLPML文字列として取得する。
-        キューが空の場合はNoneを返す。
+        実行中のツールタスクがすべて完了するか、猶予時間が経過するまで待機する。
+        ほぼ同時に終わるツールの結果を、次のターンに持ち越さずまとめて取り出すために使う。
         """
-        if self.result_queue.empty():
-            return None
+        if self._pending_tasks:
+            await asyncio.wait(self._pending_tasks, timeout=timeout)
 
+    def drain_results(self) -> List[Element]:
+        """
+        結果キューに溜まっている要素を、待機せずにすべて取り出して返す。
+        result_queueはjoin()されないため、task_done()は呼ばない。
+        """
         results: List[Element] = []
-        while not self.result_queue.empty():
-            result = await self.result_queue.get()
-            results.append(result)
-            self.result_queue.task_done()
+        while True:
+            try:
+                results.append(self.result_queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return results
 
+    async def get_tool_results_as_lpml(self) -> Optional[str]:
+        """
+        結果キューに溜まったツール実行結果をLPML文字列として取得する。
+        キューが空の場合はNoneを返す。
+        """
+        results = self.drain_results()
         if results:
             logger.info(f"Drained {len(results)} tool result(s) from the queue.")
-            _results = sum([[x, '\n\n'] for x in results], [])[:-1]
-            return deparse(_results)
+            return '\n\n'.join(deparse_one(result) for result in results)
 
         return None
@@ -4,9 +4,9 @@ import inspect
 import logging
 from abc import ABC, abstractmethod
 from asyncio import Queue
-from .lpml import Element
+from .lpml import Element, generate_element
 from typing import TYPE_CHECKING
-from typing import Dict, Type, List
+from typing import Any, Dict, Hashable, Type, List
 
 if TYPE_CHECKING:
     from .system import System
@@ -17,6 +17,10 @@ logger = logging.getLogger(__name__)
 class BaseTool(ABC):
     """すべてのツールのための抽象基底クラス"""
 
+    # 同一引数での実行結果をキャッシュしてよいか、およびその有効期間（秒）
+    CACHEABLE: bool = False
+    TTL: float = 0.0
+
     def __init__(self):
         self.system: 'System' = None
 
@@ -41,6 +45,40 @@ class BaseTool(ABC):
         """
         pass
 
+    def cache_stamp(self, element: Element) -> Hashable:
+        """
+        キャッシュ済み結果の鮮度を確かめるための値を返す。
+        キャッシュ格納時と値が異なれば、TTL内でも結果は再利用されない。
+        """
+        return None
+
+    async def _put_output(self, text: str, **attributes):
+        """
+        textを<output>要素として結果キューに書き込む。エラー通知などの定型出力に用いる。
+        """
+        await self.system.result_queue.put(
+            generate_element("output", f"\n{text}\n", tool=self.name, **attributes)
+        )
+
+
+def _get_init_param_names(tool_class: Type[BaseTool]) -> frozenset:
+    """ツールクラスの__init__が受け取る引数名（self以外）を返す。"""
+    params = inspect.signature(tool_class.__init__).parameters
+    return frozenset(params) - {'self'}
+
+
+def get_init_param_names(tool_class: Type[BaseTool]) -> frozenset:
+    """
+    ツールクラスの__init__が受け取る引数名を返す。
+    発見時にクラスへキャッシュされた値を用い、なければ求めてクラスに保持する。
+    """
+    # 親クラスの値を引き継がないよう、クラス自身の属性のみを見る
+    param_names = vars(tool_class).get('_di_param_names')
+    if param_names is None:
+        param_names = _get_init_param_names(tool_class)
+        tool_class._di_param_names = param_names
+    return param_names
+
 
 class ToolManager:
     """
@@ -50,6 +88,7 @@ class ToolManager:
         self.tool_directories = tool_directories
         self.tool_catalog: Dict[str, Type[BaseTool]] = {}
         self.discover_tools()
+        self._tool_files_state = self._snapshot_tool_files()
 
     def discover_tools(self):
         """
@@ -57,48 +96,89 @@ class ToolManager:
         """
         logger.info(f"Discovering tools in: {self.tool_directories}")
         for tool_dir in self.tool_directories:
-            if not os.path.isdir(tool_dir):
+            # scandirはエントリの種別を一覧取得時に得られるため、ファイルごとのstatが不要
+            try:
+                with os.scandir(tool_dir) as it:
+                    entries = [
+                        entry for entry in it
+                        if entry.name.endswith(".py")
+                        and not entry.name.startswith("__")
+                        and entry.is_file()
+                    ]
+            except (FileNotFoundError, NotADirectoryError):
                 logger.warning(f"Tool directory not found: {tool_dir}")
                 continue
 
-            for filename in os.listdir(tool_dir):
-                if filename.endswith(".py") and not filename.startswith("__"):
-                    module_name = f"solipsism.tools.{filename[:-3]}"
-                    module_path = os.path.join(tool_dir, filename)
-                    
-                    try:
-                        spec = importlib.util.spec_from_file_location(
-                            module_name, module_path
-                        )
-                        module = importlib.util.module_from_spec(spec)
-                        spec.loader.exec_module(module)
-
-                        for name, obj in inspect.getmembers(module):
-                            # ▼▼▼ 修正箇所 ▼▼▼
-                            if (inspect.isclass(obj) and
-                                    issubclass(obj, BaseTool) and
-                                    obj is not BaseTool and
-                                    not inspect.isabstract(obj)): # <-- この行を追加
-                            # ▲▲▲ 修正箇所 ▲▲▲
-                                try:
-                                    tool_name = obj.name
-                                    if tool_name in self.tool_catalog:
-                                        logger.warning(
-                                            f"Duplicate tool name '{tool_name}' found. Overwriting."
-                                        )
-                                    self.tool_catalog[tool_name] = obj
-                                    logger.info(
-                                        f"Discovered tool '{tool_name}' from {filename}"
-                                    )
-                                except AttributeError:
-                                    logger.error(
-                                        f"Tool class '{name}' in {filename} does not have a 'name' class attribute."
+            for entry in entries:
+                filename = entry.name
+                module_name = f"solipsism.tools.{filename[:-3]}"
+                module_path = entry.path
+                
+                try:
+                    spec = importlib.util.spec_from_file_location(
+                        module_name, module_path
+                    )
+                    module = importlib.util.module_from_spec(spec)
+                    spec.loader.exec_module(module)
+
+                    for name, obj in inspect.getmembers(module):
+                        # ▼▼▼ 修正箇所 ▼▼▼
+                        if (inspect.isclass(obj) and
+                                issubclass(obj, BaseTool) and
+                                obj is not BaseTool and
+                                not inspect.isabstract(obj)): # <-- この行を追加
+                        # ▲▲▲ 修正箇所 ▲▲▲
+                            try:
+                                tool_name = obj.name
+                                if tool_name in self.tool_catalog:
+                                    logger.warning(
+                                        f"Duplicate tool name '{tool_name}' found. Overwriting."
                                     )
+                                obj._di_param_names = _get_init_param_names(obj)
+                                self.tool_catalog[tool_name] = obj
+                                logger.info(
+                                    f"Discovered tool '{tool_name}' from {filename}"
+                                )
+                            except AttributeError:
+                                logger.error(
+                                    f"Tool class '{name}' in {filename} does not have a 'name' class attribute."
+                                )
+
+                except Exception as e:
+                    logger.error(
+                        f"Failed to load tools from {module_path}: {e}", exc_info=True
+                    )
+
+    def _snapshot_tool_files(self) -> tuple:
+        """
+        ツールファイルの (パス, mtime_ns, サイズ) の一覧を返す。
+        ファイルの上書きではディレクトリのmtimeが変わらないため、ファイル単位で記録する。
+        """
+        state = []
+        for tool_dir in self.tool_directories:
+            try:
+                with os.scandir(tool_dir) as it:
+                    for entry in it:
+                        if (entry.name.endswith(".py")
+                                and not entry.name.startswith("__")
+                                and entry.is_file()):
+                            st = entry.stat()
+                            state.append((entry.path, st.st_mtime_ns, st.st_size))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+        return tuple(sorted(state))
 
-                    except Exception as e:
-                        logger.error(
-                            f"Failed to load tools from {module_path}: {e}", exc_info=True
-                        )
+    def refresh_tools(self) -> bool:
+        """
+        前回の探索以降にツールファイルが追加・変更されていれば再探索する。
+        再探索した場合はTrueを返す。
+        """
+        state = self._snapshot_tool_files()
+        if state == self._tool_files_state:
+            return False
+        self.discover_tools()
+        self._tool_files_state = state
+        return True
 
     def get_tool_class(self, name: str) -> Type[BaseTool] | None:
         """
@@ -106,6 +186,17 @@ class ToolManager:
         """
         return self.tool_catalog.get(name)
 
+    def instantiate_tool(self, tool_class: Type[BaseTool],
+                         init_args: Dict[str, Any]) -> BaseTool:
+        """
+        init_argsのうち、ツールの__init__が受け取る引数のみを渡してインスタンス化する。
+        引数名は発見時にクラスへキャッシュされた値を用いる。
+        """
+        param_names = get_init_param_names(tool_class)
+        return tool_class(
+            **{k: v for k, v in init_args.items() if k in param_names}
+        )
+
     def get_all_tool_classes(self) -> Dict[str, Type[BaseTool]]:
         """
         発見したすべてのツールクラスのカタログを返す。
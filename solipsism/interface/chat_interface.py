@@ -1,10 +1,11 @@
 import sys
 import asyncio
 import logging
-from typing import TYPE_CHECKING, List
+import threading
+from typing import TYPE_CHECKING, List, Optional
 
 from .user_context import UserContext
-from ..core.lpml import deparse
+from ..core.lpml import deparse, deparse_one
 
 if TYPE_CHECKING:
     from ..core.manager import Manager
@@ -42,9 +43,33 @@ class ChatInterface:
         print("/exit                   - Exit the chat interface.")
         print("---------------------\n")
 
+    @staticmethod
+    def _start_stdin_reader(loop: asyncio.AbstractEventLoop) -> 'asyncio.Queue[Optional[str]]':
+        """
+        標準入力を読み続けるデーモンスレッドを1本だけ起動し、読み取った行を流すキューを返す。
+        EOFに達した場合はNoneを流す。デーモンスレッドのため、終了時に入力待ちで停止しない。
+        """
+        lines: 'asyncio.Queue[Optional[str]]' = asyncio.Queue()
+
+        def read_lines():
+            while True:
+                line = sys.stdin.readline()
+                try:
+                    loop.call_soon_threadsafe(lines.put_nowait, line or None)
+                except RuntimeError:
+                    # イベントループが既に閉じている
+                    return
+                if not line:
+                    return
+
+        threading.Thread(
+            target=read_lines, name="stdin-reader", daemon=True
+        ).start()
+        return lines
+
     async def _listen_for_input(self):
         """ユーザーからの標準入力を監視し、コマンド処理やメッセージ送信を行う。"""
-        loop = asyncio.get_running_loop()
+        lines = self._start_stdin_reader(asyncio.get_running_loop())
         send_tool = self.user_context.system.tools.get("send")
         if not send_tool:
             logger.error("SendTool not found in UserContext. Cannot send messages.")
@@ -52,7 +77,11 @@ class ChatInterface:
 
         while self.state == "RUNNING":
             try:
-                user_input = await loop.run_in_executor(None, sys.stdin.readline)
+                user_input = await lines.get()
+                if user_input is None:
+                    # 標準入力が閉じられた
+                    self.state = "TERMINATED"
+                    break
                 user_input = user_input.strip()
 
                 if not user_input:
@@ -111,7 +140,12 @@ class ChatInterface:
                 element = await queue.get()
                 tag = element.get("tag")
                 attrs = element.get("attributes", {})
-                content = deparse(element.get("content", "")).strip()
+                raw_content = element.get("content", "")
+                # send要素の内容は通常ただの文字列のため、木の走査を省く
+                if isinstance(raw_content, str):
+                    content = raw_content.strip()
+                else:
+                    content = (deparse(raw_content) or "").strip()
 
                 # カーソル行をクリアし、メッセージを表示してからプロンプトを再表示
                 print("\r" + " " * 80 + "\r", end='') # Clear the line
@@ -120,7 +154,7 @@ class ChatInterface:
                     from_id = attrs.get("from", "unknown")
                     print(f"[Log from: {from_id}]\n{content}\n")
                 else: # outputタグなど
-                    print(f"[System Message]\n{deparse([element])}\n")
+                    print(f"[System Message]\n{deparse_one(element)}\n")
                 
                 print(">>> ", end='', flush=True)
                 queue.task_done()
@@ -1,7 +1,7 @@
 import os
 import logging
 import asyncio
-import subprocess
+import weakref
 from asyncio import Queue, TimeoutError
 from solipsism.core import tool
 from solipsism.core import lpml
@@ -32,63 +32,64 @@ class BashToolV3(tool.BaseTool):
         super().__init__()
         self._process = None
         self._process_lock = asyncio.Lock()
+        # The finalizer only sees this one-slot holder, never self, so it does
+        # not keep the tool alive and runs at GC or interpreter exit.
+        self._process_ref = [None]
+        self._finalizer = weakref.finalize(
+            self, BashToolV3._finalize_process_ref, self._process_ref
+        )
         logger.info("BashToolV3 initialized. Shell process will be started on first use.")
 
-    async def _read_until_eoc(self, timeout=5) -> (str, str):
-        """Reads stdout and stderr until the EOC marker is found or timeout."""
-        stdout_buffer = []
-        stderr_buffer = []
-        start_time = asyncio.get_event_loop().time()
-        
+    async def _read_stream_until_eoc(self, stream: asyncio.StreamReader,
+                                     buf: bytearray):
+        """Appends data from the stream to buf until the EOC marker or EOF."""
+        marker = self._EOC_MARKER.encode()
         while True:
-            elapsed_time = asyncio.get_event_loop().time() - start_time
-            if elapsed_time > timeout:
-                logger.warning("Timeout reached while reading from bash process.")
-                break
+            chunk = await stream.read(65536)
+            if not chunk:
+                # EOF: the shell has exited
+                return
+            buf += chunk
+            # Only the newly appended bytes (plus a possible split marker) need checking
+            if buf.find(marker, max(0, len(buf) - len(chunk) - len(marker))) != -1:
+                return
 
-            # Read from stdout
-            try:
-                # Use a very short timeout for readline to be non-blocking
-                line = await asyncio.wait_for(
-                    asyncio.to_thread(self._process.stdout.readline), timeout=0.05
-                )
-                if line:
-                    if self._EOC_MARKER in line:
-                        # Remove marker and any text after it
-                        line_parts = line.split(self._EOC_MARKER, 1)
-                        stdout_buffer.append(line_parts[0].strip())
-                        break # EOC marker found, stop reading
-                    stdout_buffer.append(line.strip())
-                else:
-                    # If readline returns empty string, it might mean EOF or nothing yet
-                    # Give it a tiny sleep to allow more output to accumulate
-                    await asyncio.sleep(0.01) 
-            except TimeoutError:
-                pass # No line in this iteration, try stderr or next loop
-            except Exception as e:
-                logger.warning(f"Error reading stdout: {e}")
-                break
+    async def _read_until_eoc(self, timeout=5) -> (str, str):
+        """Reads stdout and stderr until the EOC marker is found or timeout.
 
-            # Read from stderr (non-blocking)
-            try:
-                # Using read(1) with a timeout to be truly non-blocking per character
-                # This is less efficient but ensures we don't block on stderr if stdout has data
-                # For simplicity, we'll just try readline with a short timeout as well
-                err_line = await asyncio.wait_for(
-                    asyncio.to_thread(self._process.stderr.readline), timeout=0.05
+        The marker is echoed to both streams, so each one is read concurrently
+        until its own marker and no stderr output is left behind.
+        """
+        marker = self._EOC_MARKER.encode()
+        stdout_buf = bytearray()
+        stderr_buf = bytearray()
+        try:
+            async with asyncio.timeout(timeout):
+                await asyncio.gather(
+                    self._read_stream_until_eoc(self._process.stdout, stdout_buf),
+                    self._read_stream_until_eoc(self._process.stderr, stderr_buf),
                 )
-                if err_line:
-                    stderr_buffer.append(err_line.strip())
-            except TimeoutError:
-                pass
-            except Exception as e:
-                logger.warning(f"Error reading stderr: {e}")
-                break
-            
-            # Prevent busy-waiting
-            await asyncio.sleep(0.01)
+        except TimeoutError:
+            logger.warning("Timeout reached while reading from bash process.")
+
+        # Remove marker and any text after it, then decode each stream once
+        return (
+            self._decode_output(stdout_buf, marker),
+            self._decode_output(stderr_buf, marker),
+        )
+
+    @staticmethod
+    def _decode_output(buf: bytearray, marker: bytes) -> str:
+        """Decodes the bytes before the marker, keeping the output's own layout."""
+        end = buf.find(marker)
+        if end == -1:
+            end = len(buf)
+        return bytes(buf[:end]).decode("utf-8", errors="replace").strip()
 
-        return "\n".join(stdout_buffer), "\n".join(stderr_buffer)
+    async def _send(self, text: str):
+        """Writes text to the shell's stdin."""
+        self._process.stdin.write(text.encode())
+        await self._process.stdin.drain()
 
     async def _start_shell_process(self):
         """Starts a new interactive bash shell process and consumes initial output."""
@@ -96,40 +97,40 @@ class BashToolV3(tool.BaseTool):
             await self._terminate_shell_process()
 
         logger.info("Starting new bash interactive shell process...")
-        self._process = await asyncio.to_thread(
-            subprocess.Popen,
-            ['bash'], # Default interactive bash shell
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True, # Decode stdin/stdout/stderr as text
-            bufsize=1, # Line-buffered for stdout/stderr
-            shell=False # Do not use shell=True, as we are explicitly calling bash
+        self._process = await asyncio.create_subprocess_exec(
+            'bash', # Default interactive bash shell
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
         )
-        
+        self._process_ref[0] = self._process
+
         # Send an initial EOC marker to clear startup messages/prompt
-        await asyncio.to_thread(self._process.stdin.write, f"echo {self._EOC_MARKER}\n")
-        await asyncio.to_thread(self._process.stdin.flush)
+        await self._send(self._eoc_command())
         await self._read_until_eoc(timeout=2) # Read until EOC or timeout for initial prompt
         logger.info("Bash shell process started and initial output consumed.")
 
+    def _eoc_command(self) -> str:
+        """Returns the command that prints the EOC marker to stdout and stderr."""
+        return f"echo {self._EOC_MARKER}; echo {self._EOC_MARKER} >&2\n"
+
     async def _terminate_shell_process(self):
         """Terminates the current bash shell process."""
         if self._process:
             logger.info("Terminating bash shell process...")
             try:
                 # Send 'exit' command to gracefully close the shell
-                self._process.stdin.write("exit\n")
-                await asyncio.to_thread(self._process.stdin.flush)
-                await asyncio.to_thread(self._process.wait, timeout=2)
+                await self._send("exit\n")
+                await asyncio.wait_for(self._process.wait(), timeout=2)
             except Exception as e:
                 logger.warning(f"Error sending exit to bash process or waiting: {e}")
             
-            if self._process.poll() is None: # If still running
+            if self._process.returncode is None: # If still running
                 logger.warning("Bash process did not exit gracefully, terminating.")
-                await asyncio.to_thread(self._process.kill)
-                await asyncio.to_thread(self._process.wait)
+                self._process.kill()
+                await self._process.wait()
             self._process = None
+            self._process_ref[0] = None
             logger.info("Bash shell process terminated.")
 
     async def run(self, element: lpml.Element):
@@ -150,25 +151,25 @@ class BashToolV3(tool.BaseTool):
             return
 
         async with self._process_lock:
-            if reset_session or not self._process or self._process.poll() is not None:
+            if reset_session or not self._process or self._process.returncode is not None:
                 await self._start_shell_process()
 
             try:
                 # Send command, followed by a newline and the EOC marker
-                full_command_with_eoc = f"{command_script}\necho {self._EOC_MARKER}\n"
+                full_command_with_eoc = f"{command_script}\n{self._eoc_command()}"
                 logger.info(f"Sending script to bash: \n{command_script}")
-                await asyncio.to_thread(self._process.stdin.write, full_command_with_eoc)
-                await asyncio.to_thread(self._process.stdin.flush)
+                await self._send(full_command_with_eoc)
 
                 stdout_output, stderr_output = await self._read_until_eoc()
 
-                result_content = f"Bash script executed:\n```bash\n{command_script}\n```\n"
+                parts = [f"Bash script executed:\n```bash\n{command_script}\n```\n"]
                 if stdout_output:
-                    result_content += f"STDOUT:\n{stdout_output}\n"
+                    parts.append(f"STDOUT:\n{stdout_output}\n")
                 if stderr_output:
-                    result_content += f"STDERR:\n{stderr_output}\n"
+                    parts.append(f"STDERR:\n{stderr_output}\n")
                 if not stdout_output and not stderr_output:
-                    result_content += "No output from script."
+                    parts.append("No output from script.")
+                result_content = "".join(parts)
 
             except Exception as e:
                 logger.error(f"Error during bash execution: {e}", exc_info=True)
@@ -181,18 +182,15 @@ class BashToolV3(tool.BaseTool):
         )
         await self.system.result_queue.put(output_element)
 
-    def __del__(self):
+    @staticmethod
+    def _finalize_process_ref(process_ref: list):
+        """Kills a shell process left running when the tool is collected."""
         # This is a fallback. Graceful termination should be handled by the system
         # or explicit calls if possible.
-        if self._process and self._process.poll() is None:
+        process = process_ref[0]
+        if process and process.returncode is None:
             logger.warning("BashToolV3 being garbage collected, attempting to terminate lingering process.")
             try:
-                # Attempt to send exit command, then kill
-                self._process.stdin.write("exit\n")
-                self._process.stdin.flush()
-                self._process.wait(timeout=1)
+                process.kill()
             except Exception:
-                pass # Ignore errors during __del__ cleanup
-            if self._process.poll() is None:
-                self._process.kill()
-                self._process.wait()
\ No newline at end of file
+                pass # Ignore errors during cleanup
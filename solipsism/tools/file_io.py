@@ -1,5 +1,6 @@
 import os
-import shutil
+import mmap
+import asyncio
 import logging
 from asyncio import Queue
 from ..core import tool
@@ -66,6 +67,83 @@ Attributes:
 """.strip()
 
 
+# --- Low-level I/O Helpers ---
+
+def _read_all(path: str) -> bytes:
+    """Reads a whole file with raw os.read calls, bypassing the io stack."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        chunks = []
+        while True:
+            # st_size is only a hint; keep reading until EOF.
+            chunk = os.read(fd, max(size, 65536))
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+    finally:
+        os.close(fd)
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    """Writes all of data to fd, retrying on short writes."""
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _line_offset(buf, line: int, pos: int = 0) -> int:
+    """Returns the byte offset where the 0-indexed line starts (clamped to EOF)."""
+    for _ in range(line):
+        newline = buf.find(b'\n', pos)
+        if newline == -1:
+            return len(buf)
+        pos = newline + 1
+    return pos
+
+
+def _write_spliced(fd: int, buf, start: int, end: int, data: bytes) -> None:
+    """Writes buf to fd with lines [start, end) replaced by data."""
+    head = _line_offset(buf, start)
+    tail = _line_offset(buf, end - start, head)
+    if head and buf[head - 1:head] != b'\n':
+        data = b'\n' + data # Last line had no newline
+    _write_all(fd, buf[:head])
+    _write_all(fd, data)
+    _write_all(fd, buf[tail:])
+
+
+def _splice_lines(path: str, start: int, end: int, data: bytes) -> None:
+    """
+    Replaces lines [start, end) of the file with data (end == start inserts).
+    The file is mapped rather than split into line objects, and the result is
+    written to a temporary file that atomically replaces the original.
+    """
+    import tempfile  # Imported lazily; it pulls in shutil
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        try:
+            with open(path, 'rb') as src:
+                st = os.fstat(src.fileno())
+                os.fchmod(fd, st.st_mode & 0o7777)
+                if st.st_size == 0:  # An empty file cannot be mapped
+                    _write_spliced(fd, b"", start, end, data)
+                else:
+                    with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                        _write_spliced(fd, buf, start, end, data)
+        except FileNotFoundError:
+            os.fchmod(fd, 0o644)
+            _write_spliced(fd, b"", start, end, data)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
 # --- Base Class for Filesystem Tools ---
 
 class FileSystemTool(tool.BaseTool):
@@ -78,6 +156,10 @@ class FileSystemTool(tool.BaseTool):
     def __init__(self, root_path="."):
         super().__init__()  # BaseToolの__init__を呼び出す
         self.root_path = os.path.abspath(root_path)
+        # join with "" appends exactly one separator (and leaves "/" as is)
+        self._root_with_sep = os.path.join(self.root_path, "")
+        # Parent directories already created/confirmed by this tool
+        self._known_dirs = set()
         logger.info(
             f"{self.__class__.__name__} initialized with root: {self.root_path}"
         )
@@ -90,31 +172,53 @@ class FileSystemTool(tool.BaseTool):
         if not path:
             raise ValueError("Path attribute cannot be empty.")
 
-        safe_path = os.path.abspath(os.path.join(self.root_path, path))
-        if not safe_path.startswith(self.root_path):
+        # root_path is already absolute, so the join is too; normpath suffices
+        safe_path = os.path.normpath(os.path.join(self.root_path, path))
+        if not (safe_path == self.root_path
+                or safe_path.startswith(self._root_with_sep)):
             raise PermissionError(
                 "Access denied: Path is outside the allowed root directory."
             )
         return safe_path
 
+    def cache_stamp(self, element: lpml.Element):
+        """
+        Returns (st_mtime_ns, st_size) of the target path, or None if it
+        cannot be stat'ed. Other contexts share the filesystem, so a cached
+        result is only reused while the target is unchanged.
+        """
+        try:
+            path = element.get("attributes", {}).get("path")
+            st = os.stat(self._get_safe_path(path))
+        except (OSError, ValueError):
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
     async def run(self, element: lpml.Element):
         """
         Generic async run handler that wraps synchronous file operations.
         Results are put into the system's result queue.
         """
         attributes = element.get("attributes", {})
+        # Stamp before reading, so a change made during the read misses the cache
+        stamp = self.cache_stamp(element) if self.CACHEABLE else None
+        cacheable = self.CACHEABLE
         try:
-            # For production, blocking I/O should run in a separate thread
-            # via asyncio.to_thread to avoid blocking the event loop.
-            result_content = self._sync_logic(element)
+            # Blocking I/O runs in a worker thread so the event loop stays responsive.
+            result_content = await asyncio.to_thread(self._sync_logic, element)
         except Exception as e:
             logger.error(f"Error in {self.name}: {e}", exc_info=True)
             result_content = f"Error: An unexpected error occurred. {e}"
+            cacheable = False
 
         output_element = lpml.generate_element(
             "output", "\n" + result_content + "\n",
             tool=self.name, **attributes
         )
+        # Errors are not cached: the cause (e.g. a missing file) may be fixed at any time
+        if cacheable and stamp is not None and not result_content.startswith("Error:"):
+            self.system.tool_cache.put(
+                self.name, element, output_element, self.TTL, stamp)
         # self.system 経由で結果キューにアクセスする
         await self.system.result_queue.put(output_element)
 
@@ -133,6 +237,8 @@ class FileSystemTool(tool.BaseTool):
 class ListFilesTool(FileSystemTool):
     name = "list_files"
     definition = DEFINE_LIST_FILES
+    CACHEABLE = True
+    TTL = 5.0
 
 
     def _sync_logic(self, element: lpml.Element) -> str:
@@ -163,13 +269,20 @@ class ListFilesTool(FileSystemTool):
                     output_lines.append(f"{prefix}{f}")
             return '\n'.join(output_lines) if output_lines else f"Directory '{path}' is empty."
         else:
-            files = os.listdir(target_path)
+            # DirEntry の型情報は readdir の d_type から得られるため、追加の stat は発生しない
+            with os.scandir(target_path) as it:
+                files = [
+                    f"{e.name}/" if e.is_dir(follow_symlinks=False) else e.name
+                    for e in it
+                ]
             return '\n'.join(sorted(files)) if files else f"Directory '{path}' is empty." # Sort for consistent output
 
 
 class ReadFileTool(FileSystemTool):
     name = "read_file"
     definition = DEFINE_READ_FILE
+    CACHEABLE = True
+    TTL = 60.0
 
     def _sync_logic(self, element: lpml.Element) -> str:
         attributes = element.get("attributes", {})
@@ -183,11 +296,16 @@ class ReadFileTool(FileSystemTool):
         if not os.path.isfile(target_path):
             return f"Error: Path is not a file - '{path}'"
 
-        with open(target_path, 'r', encoding='utf-8') as f:
-            if show_lines:
-                lines = f.readlines()
-                return "".join(f"{i+1}: {line}" for i, line in enumerate(lines))
-            return f.read()
+        text = _read_all(target_path).decode('utf-8')
+        if show_lines:
+            # Number lines on '\n' only, as write_file's line ranges do
+            # (str.splitlines would also break on '\r', '\f', U+2028, ...)
+            lines = text.split('\n')
+            # The piece after the last '\n' is an unterminated line, or empty
+            tail = lines.pop()
+            numbered = "".join([f"{i}: {line}\n" for i, line in enumerate(lines, 1)])
+            return (numbered + f"{len(lines) + 1}: {tail}") if tail else numbered
+        return text
 
 
 class WriteFileTool(FileSystemTool):
@@ -197,7 +315,12 @@ class WriteFileTool(FileSystemTool):
     def _sync_logic(self, element: lpml.Element) -> str:
         # (The complex logic from the previous version is moved here)
         # ... (implementation is long, so it's placed at the end for clarity)
-        return self._write_logic(element)
+        try:
+            return self._write_logic(element)
+        except FileNotFoundError:
+            # A cached parent directory was removed behind our back; retry once
+            self._known_dirs.clear()
+            return self._write_logic(element)
 
     def _write_logic(self, element: lpml.Element) -> str:
         # ... (Implementation from previous response)
@@ -211,44 +334,44 @@ class WriteFileTool(FileSystemTool):
             return "Error: 'path' attribute is missing."
 
         target_path = self._get_safe_path(path)
-        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        parent = os.path.dirname(target_path)
+        if parent not in self._known_dirs:
+            os.makedirs(parent, exist_ok=True)
+            if len(self._known_dirs) >= 1024:
+                self._known_dirs.clear()
+            self._known_dirs.add(parent)
 
         if mode == "overwrite":
-            with open(target_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            fd = os.open(target_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                _write_all(fd, content.encode('utf-8'))
+            finally:
+                os.close(fd)
             return f"Successfully overwrote file '{path}'."
 
         if mode == "append":
-            # Ensure new content starts on a new line if current file doesn't end with one
-            if os.path.exists(target_path) and os.path.getsize(target_path) > 0:
-                with open(target_path, 'rb') as f: # Open in binary mode to read last byte
-                    f.seek(-1, os.SEEK_END)
-                    last_char = f.read(1)
-                    if last_char != b'\n':
-                        content = '\n' + content # Prepend a newline
-
-            with open(target_path, 'a', encoding='utf-8') as f:
-                f.write(content)
+            fd = os.open(target_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                data = content.encode('utf-8')
+                # Ensure new content starts on a new line if current file doesn't end with one
+                size = os.fstat(fd).st_size
+                if size > 0 and os.pread(fd, 1, size - 1) != b'\n':
+                    data = b'\n' + data # Prepend a newline
+                _write_all(fd, data)
+            finally:
+                os.close(fd)
             return f"Successfully appended to file '{path}'."
 
         try:
-            lines = []
-            if os.path.exists(target_path):
-                with open(target_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-
             if mode == "insert_at_line":
-                line_num = int(attributes.get("line", 1)) - 1
-                lines.insert(line_num, content + '\n')
+                start = end = max(int(attributes.get("line", 1)) - 1, 0)
             elif mode == "replace_lines":
-                start = int(attributes.get("start_line", 1)) - 1
-                end = int(attributes.get("end_line", start + 1)) - 1
-                lines = lines[:start] + [content + '\n'] + lines[end+1:]
+                start = max(int(attributes.get("start_line", 1)) - 1, 0)
+                end = max(int(attributes.get("end_line", start + 1)), start)
             else:
                 return f"Error: Unknown write mode '{mode}'."
 
-            with open(target_path, 'w', encoding='utf-8') as f:
-                f.writelines(lines)
+            _splice_lines(target_path, start, end, (content + '\n').encode('utf-8'))
             return f"Successfully modified '{path}' with mode '{mode}'."
 
         except (ValueError, KeyError, IndexError) as e:
@@ -301,7 +424,14 @@ class MoveItemTool(FileSystemTool):
         if os.path.exists(dest_path):
             return f"Error: Destination path already exists - '{destination}'"
 
-        shutil.move(source_path, dest_path)
+        try:
+            # Same filesystem: a single rename(2), no copying at all.
+            os.rename(source_path, dest_path)
+        except OSError:
+            # Cross-device (EXDEV) and other cases: shutil.move copies via
+            # copy2, which uses in-kernel sendfile on Linux.
+            import shutil  # Imported lazily; only moves and deletes need it
+            shutil.move(source_path, dest_path)
         return f"Successfully moved '{source}' to '{destination}'."
 
 
@@ -322,6 +452,7 @@ class DeleteItemTool(FileSystemTool):
             os.remove(target_path)
             return f"Successfully deleted file '{path}'."
         elif os.path.isdir(target_path):
+            import shutil  # Imported lazily; only moves and deletes need it
             shutil.rmtree(target_path)
             return f"Successfully deleted directory '{path}' and its contents."
         else:
@@ -1,11 +1,71 @@
 import os
+import re
 import ast
+import asyncio
 import logging
+import operator
 from solipsism.core import tool
 from solipsism.core import lpml
 
 logger = logging.getLogger(__name__)
 
+# file_path -> ((st_mtime_ns, st_size), (tool_name, tool_def_content))
+_PARSE_CACHE = {}
+
+# Fast-path patterns for the conventional tool file layout (see _scan_tool_source)
+_CLASS_RE = re.compile(r"^[ \t]*class\s", re.M)
+_TOOL_CLASS_RE = re.compile(r"^class\s+\w+\s*\(\s*tool\.BaseTool\s*\)\s*:", re.M)
+_BODY_INDENT_RE = re.compile(r".*\n(?:[ \t]*\n)*([ \t]+)")
+_NAME_RE = re.compile(r"^([ \t]+)name\s*=(.*)$", re.M)
+_DEFINITION_RE = re.compile(r"^([ \t]+)definition\s*=(.*)$", re.M)
+_NAME_VALUE_RE = re.compile(r"""\s*(["'])([^"'\\\n]*)\1\s*(?:#.*)?""")
+_DEFINITION_VALUE_RE = re.compile(r"\s*([A-Za-z_]\w*)\s*(?:#.*)?")
+_STRIP_CALL_RE = re.compile(r"(?:\.strip\(\))?\s*(?:#.*)?")
+
+
+def _scan_tool_source(source):
+    """
+    Extracts (tool_name, tool_def_content) with regular expressions.
+
+    Returns:
+        None if the layout is not the plain one (one tool class, simple
+        literals, no escapes); the caller then falls back to the AST.
+        Otherwise a tuple that is final, including (None, None) for a
+        source that does not mention BaseTool at all.
+    """
+    if "BaseTool" not in source:
+        return None, None
+    if len(_CLASS_RE.findall(source)) != 1:
+        return None
+    class_match = _TOOL_CLASS_RE.search(source)
+    if class_match is None:
+        return None
+    body = _BODY_INDENT_RE.match(source, class_match.end())
+    # Both assignments must sit directly in the class body
+    names = _NAME_RE.findall(source, class_match.end())
+    definitions = _DEFINITION_RE.findall(source, class_match.end())
+    if (body is None or len(names) != 1 or len(definitions) != 1
+            or len(_NAME_RE.findall(source)) != 1
+            or len(_DEFINITION_RE.findall(source)) != 1
+            or names[0][0] != body.group(1) or definitions[0][0] != body.group(1)):
+        return None
+    name_match = _NAME_VALUE_RE.fullmatch(names[0][1])
+    definition_match = _DEFINITION_VALUE_RE.fullmatch(definitions[0][1])
+    if name_match is None or definition_match is None:
+        return None
+    var_name = definition_match.group(1)
+    values = re.findall(
+        rf'^{var_name}\s*=\s*"""(.*?)"""(.*)$', source, re.M | re.S
+    )
+    if len(values) != 1:
+        return None
+    value, rest = values[0]
+    # The value may be followed by .strip() (the repo's usual form) and a comment
+    if _STRIP_CALL_RE.fullmatch(rest.split("\n", 1)[0]) is None or "\\" in value:
+        return None
+    return name_match.group(2), value.strip()
+
+
 DEFINE_GET_TOOL_DETAILS = """
 <define_tag name="get_tool_details">
 Scans all tool directories, parses the Python files, and extracts the name and LPML definition of every available tool. This tool takes no attributes.
@@ -20,19 +80,50 @@ class GetToolDetailsTool(tool.BaseTool):
     name = "get_tool_details"
     definition = DEFINE_GET_TOOL_DETAILS
 
-    def _parse_tool_file(self, file_path):
+    def _parse_tool_file(self, file_path, st=None):
+        """
+        Returns the tool name and LPML definition of a Python file.
+        Results are cached until the file's mtime or size changes.
+        st may be passed in when the caller already has the file's stat result.
+        """
+        try:
+            if st is None:
+                st = os.stat(file_path)
+        except OSError as e:
+            logger.warning(f"Could not stat tool file {file_path}: {e}")
+            return None, None
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = _PARSE_CACHE.get(file_path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        result = self._parse_tool_source(file_path, st.st_size)
+        _PARSE_CACHE[file_path] = (stamp, result)
+        return result
+
+    def _parse_tool_source(self, file_path, size):
         """Safely parses a Python file to find tool name and its LPML definition."""
+        if size == 0:
+            return None, None
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                source = f.read()
-            tree = ast.parse(source)
+            # The size is already known from stat, so a single read suffices
+            fd = os.open(file_path, os.O_RDONLY | os.O_CLOEXEC)
+            try:
+                source = os.read(fd, size).decode("utf-8")
+            finally:
+                os.close(fd)
+            # Conventional tool files are handled without building an AST
+            scanned = _scan_tool_source(source)
+            if scanned is not None:
+                return scanned
+            tree = ast.parse(source, filename=file_path)
             
             tool_name = None
             tool_def_var_name = None
             tool_def_content = None
 
-            # First pass: Find the class to get the tool name and definition variable name
-            for node in ast.walk(tree):
+            # First pass: Find the class to get the tool name and definition variable name.
+            # Tool classes are defined at module level, so only the top level is visited.
+            for node in tree.body:
                 if isinstance(node, ast.ClassDef):
                     is_tool_class = any(
                         (isinstance(base, ast.Attribute) and isinstance(base.value, ast.Name) and base.value.id == 'tool' and base.attr == 'BaseTool')
@@ -44,8 +135,9 @@ class GetToolDetailsTool(tool.BaseTool):
                     for class_item in node.body:
                         if isinstance(class_item, ast.Assign) and isinstance(class_item.targets[0], ast.Name):
                             target_name = class_item.targets[0].id
-                            if target_name == 'name' and isinstance(class_item.value, ast.Str):
-                                tool_name = class_item.value.s
+                            if (target_name == 'name' and isinstance(class_item.value, ast.Constant)
+                                    and isinstance(class_item.value.value, str)):
+                                tool_name = class_item.value.value
                             elif target_name == 'definition' and isinstance(class_item.value, ast.Name):
                                 tool_def_var_name = class_item.value.id
                     
@@ -54,10 +146,17 @@ class GetToolDetailsTool(tool.BaseTool):
             
             # Second pass: Find the definition string itself at the module level
             if tool_def_var_name:
-                for node in ast.iter_child_nodes(tree):
+                for node in tree.body:
                     if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name):
-                        if node.targets[0].id == tool_def_var_name and isinstance(node.value, ast.Str):
-                            tool_def_content = node.value.s.strip()
+                        if node.targets[0].id != tool_def_var_name:
+                            continue
+                        value = node.value
+                        # DEFINE_... = """...""".strip() is the usual form
+                        if (isinstance(value, ast.Call) and not value.args and not value.keywords
+                                and isinstance(value.func, ast.Attribute) and value.func.attr == 'strip'):
+                            value = value.func.value
+                        if isinstance(value, ast.Constant) and isinstance(value.value, str):
+                            tool_def_content = value.value.strip()
                             break
             
             if tool_name and tool_def_content:
@@ -67,25 +166,44 @@ class GetToolDetailsTool(tool.BaseTool):
             return None, None
         return None, None
 
+    def _scan_tool_dir(self, tool_dir):
+        """Returns (tool_name, definition) for every tool defined in tool_dir."""
+        details = []
+        try:
+            it = os.scandir(tool_dir)
+        except (FileNotFoundError, NotADirectoryError):
+            return details
+        with it:
+            for entry in it:
+                if (entry.name.endswith(".py") and entry.name != "__init__.py"
+                        and entry.is_file()):
+                    name, definition_content = self._parse_tool_file(
+                        entry.path, entry.stat()
+                    )
+                    if name and definition_content:
+                        details.append((name, definition_content))
+        return details
+
     async def run(self, element: lpml.Element):
         attributes = element.get("attributes", {})
         tool_dirs = ["./solipsism/tools", "./workspace/tools"]
-        all_tool_details = []
-
-        for tool_dir in tool_dirs:
-            if not os.path.isdir(tool_dir):
-                continue
-            for filename in os.listdir(tool_dir):
-                if filename.endswith(".py") and filename != "__init__.py":
-                    file_path = os.path.join(tool_dir, filename)
-                    name, definition_content = self._parse_tool_file(file_path)
-                    if name and definition_content:
-                        all_tool_details.append(f"Tool Name: {name}\nDefinition:\n{definition_content}")
+
+        # Directory scans and parses are blocking, so each directory is handled
+        # in a worker thread; the directories are scanned concurrently.
+        scanned = await asyncio.gather(
+            *(asyncio.to_thread(self._scan_tool_dir, d) for d in tool_dirs)
+        )
+        all_tool_details = [detail for details in scanned for detail in details]
+        # Sort on the name alone rather than on the whole formatted entry
+        all_tool_details.sort(key=operator.itemgetter(0))
 
         if not all_tool_details:
             result_content = "No tools found or parsed."
         else:
-            result_content = "Available Tools and Definitions:\n\n" + "\n\n".join(sorted(all_tool_details))
+            result_content = "Available Tools and Definitions:\n\n" + "\n\n".join(
+                f"Tool Name: {name}\nDefinition:\n{definition_content}"
+                for name, definition_content in all_tool_details
+            )
         
         try:
             output_element = lpml.generate_element(
@@ -3,7 +3,7 @@ from typing import TYPE_CHECKING
 
 from ..core import tool
 from ..core import lpml
-from ..core.lpml import findall, deparse
+from ..core.lpml import findall_multi, deparse
 
 if TYPE_CHECKING:
     from ..core.manager import Manager
@@ -43,9 +43,7 @@ class SendTool(tool.BaseTool):
             error_content = f"Error: Sender context '{from_id}' not found in Manager."
 
         if error_content:
-            await self.system.result_queue.put(lpml.generate_element(
-                "output", f"\n{error_content}\n", tool=self.name, **attributes
-            ))
+            await self._put_output(error_content, **attributes)
             return
 
         actual_to_id = None
@@ -57,9 +55,7 @@ class SendTool(tool.BaseTool):
             actual_to_id = to_id_raw
         
         if error_content:
-            await self.system.result_queue.put(lpml.generate_element(
-                "output", f"\n{error_content}\n", tool=self.name, **attributes
-            ))
+            await self._put_output(error_content, **attributes)
             return
 
         message_to_send = lpml.generate_element(
@@ -74,10 +70,10 @@ class SendTool(tool.BaseTool):
         )
 
         if not success:
-            await self.system.result_queue.put(lpml.generate_element(
-                "output", f"\nError: Failed to send message to '{actual_to_id}'. Not found or permission denied.\n", 
-                tool=self.name, **attributes
-            ))
+            await self._put_output(
+                f"Error: Failed to send message to '{actual_to_id}'. Not found or permission denied.",
+                **attributes
+            )
 
 DEFINE_CREATE_CONTEXT = """
 <define_tag name="create_context">
@@ -115,28 +111,29 @@ class CreateContextTool(tool.BaseTool):
         
         # content_treeがNoneや空でないことを確認
         if not content_tree or not isinstance(content_tree, list):
-            await self.system.result_queue.put(lpml.generate_element(
-                "output", "\nError: <create_context> tag must contain <tools> and <task> sub-tags.\n", tool=self.name
-            ))
+            await self._put_output(
+                "Error: <create_context> tag must contain <tools> and <task> sub-tags."
+            )
             return
             
         custom_id = attributes.get("id")
-        
-        task_element = findall(content_tree, "task")
+
+        # <tool>は<tools>の中にネストしているため、ツリー全体を一度だけ走査して集める
+        found = findall_multi(content_tree, ("task", "tool", "llm", "prompt"))
+
+        task_element = found.get("task")
         if not task_element:
-            await self.system.result_queue.put(lpml.generate_element(
-                "output", "\nError: <task> tag is required.\n", tool=self.name
-            ))
+            await self._put_output("Error: <task> tag is required.")
             return
         task = deparse(task_element[0].get("content", "")).strip()
 
-        tool_elements = findall(content_tree, "tool")
+        tool_elements = found.get("tool", [])
         tool_names = [t.get("attributes", {}).get("name") for t in tool_elements if t.get("attributes", {}).get("name")]
         
-        llm_config = findall(content_tree, "llm")
+        llm_config = found.get("llm")
         llm_config = llm_config[0].get("attributes") if llm_config else {}
 
-        prompt_config = findall(content_tree, "prompt")
+        prompt_config = found.get("prompt")
         prompt_path = prompt_config[0].get("attributes", {}).get("path") if prompt_config else None
 
         try:
@@ -151,16 +148,14 @@ class CreateContextTool(tool.BaseTool):
             )
             if new_context:
                 result_content = f"Successfully created new context. ID: {new_context.id}"
-                output_element = lpml.generate_element(
-                    "output", f"\n{result_content}\n", tool=self.name, status="success", id=new_context.id
-                )
             else:
                 raise Exception("Manager failed to create context for an unknown reason.")
 
         except Exception as e:
             logger.error(f"Failed to create context: {e}", exc_info=True)
-            output_element = lpml.generate_element(
-                "output", f"\nError: Failed to create context. {e}\n", tool=self.name, status="error"
+            await self._put_output(
+                f"Error: Failed to create context. {e}", status="error"
             )
-            
-        await self.system.result_queue.put(output_element)
+            return
+
+        await self._put_output(result_content, status="success", id=new_context.id)
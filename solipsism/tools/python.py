@@ -1,8 +1,10 @@
 import io
+import os
 import sys
 import logging
 import traceback
 import asyncio
+import functools
 from contextlib import redirect_stdout, redirect_stderr
 
 from solipsism.core import tool
@@ -19,6 +21,20 @@ Variables and imports are preserved across calls within the same context.
 """.strip()
 
 
+@functools.lru_cache(maxsize=64)
+def _compile_code(code: str):
+    """Compiles a code block once; re-running the same block reuses the code object."""
+    return compile(code, "<string>", "exec")
+
+
+def _format_user_exception(exc: BaseException) -> str:
+    """Formats exc starting from the first frame outside this module (the user's code)."""
+    tb = exc.__traceback__
+    while tb is not None and tb.tb_frame.f_code.co_filename == __file__:
+        tb = tb.tb_next
+    return "".join(traceback.format_exception(type(exc), exc, tb))
+
+
 class PythonReplTool(tool.BaseTool):
     """
     A tool that provides a stateful Python REPL (Read-Eval-Print Loop).
@@ -27,6 +43,10 @@ class PythonReplTool(tool.BaseTool):
     name = "python"
     definition = DEFINE_PYTHON_REPL
 
+    # Shared by all instances so that concurrent snippets cannot take over
+    # the default thread pool that other tools also rely on.
+    _cpu_sem = asyncio.Semaphore(os.cpu_count() or 4)
+
     def __init__(self):
         super().__init__()
         # Each tool instance gets its own namespace to maintain state.
@@ -40,16 +60,13 @@ class PythonReplTool(tool.BaseTool):
         attributes = element.get("attributes", {})
         try:
             # Run the blocking code in a separate thread to avoid blocking the event loop.
-            result_content = await asyncio.to_thread(self._sync_logic, element)
+            async with self._cpu_sem:
+                result_content = await asyncio.to_thread(self._sync_logic, element)
         except Exception as e:
             logger.error(f"Error in {self.name}: {e}", exc_info=True)
             result_content = f"Error: An unexpected error occurred. {e}"
 
-        output_element = lpml.generate_element(
-            "output", "\n" + result_content + "\n",
-            tool=self.name, **attributes
-        )
-        await self.system.result_queue.put(output_element)
+        await self._put_output(result_content, **attributes)
 
     def _sync_logic(self, element: lpml.Element) -> str:
         """
@@ -70,11 +87,11 @@ class PythonReplTool(tool.BaseTool):
         try:
             with redirect_stdout(stdout_capture), redirect_stderr(stderr_capture):
                 # Use exec to run the code in the persistent namespace
-                exec(code, self.namespace)
-        except Exception:
-            # If an exception occurs, capture it
-            # traceback.format_exc() provides a detailed error message
-            stderr_capture.write(traceback.format_exc())
+                exec(_compile_code(code), self.namespace)
+        except BaseException as e:
+            # If an exception occurs (including SystemExit from exit()), capture it.
+            # The tool's own frames are left out so only the user's code is shown.
+            stderr_capture.write(_format_user_exception(e))
 
         stdout_val = stdout_capture.getvalue()
         stderr_val = stderr_capture.getvalue()
@@ -1,5 +1,4 @@
 import logging
-import inspect
 from ..core import tool
 from ..core import lpml
 from ..core.tool import ToolManager
@@ -40,21 +39,14 @@ class RegisterTool(tool.BaseTool):
         tool_to_register = attributes.get("name")
 
         if not tool_to_register:
-            error_content = "Error: 'name' attribute is missing."
-            output = lpml.generate_element(
-                "output", f"\n{error_content}\n", tool=self.name, **attributes
-            )
-            await self.system.result_queue.put(output)
+            await self._put_output("Error: 'name' attribute is missing.", **attributes)
             return
 
         tool_class = self.tool_manager.get_tool_class(tool_to_register)
 
         if not tool_class:
             error_content = f"Error: Tool '{tool_to_register}' not found in the catalog. Did you run 'list_available_tools' to refresh the catalog after creating the tool file?"
-            output = lpml.generate_element(
-                "output", f"\n{error_content}\n", tool=self.name, **attributes
-            )
-            await self.system.result_queue.put(output)
+            await self._put_output(error_content, **attributes)
             return
 
         # ▼▼▼ 修正箇所: 既存ツール登録チェックを削除し、上書きを許可する ▼▼▼
@@ -68,36 +60,26 @@ class RegisterTool(tool.BaseTool):
         # ▲▲▲ 修正箇所 ▲▲▲
 
         try:
-            sig = inspect.signature(tool_class.__init__)
-            params = {}
             full_init_args = {"tool_manager": self.tool_manager, **self.tool_init_args}
-
-            for param in sig.parameters.values():
-                if param.name == 'self':
-                    continue
-                if param.name in full_init_args:
-                    params[param.name] = full_init_args[param.name]
-            
-            new_tool_instance = tool_class(**params)
+            # __init__の引数名はクラスごとにキャッシュされるため、signatureの解析は初回のみ
+            new_tool_instance = self.tool_manager.instantiate_tool(
+                tool_class, full_init_args
+            )
             self.system.add_tool(new_tool_instance)
             
             # ▼▼▼ 以前の修正箇所 ▼▼▼
             tool_definition = tool_class.definition if hasattr(tool_class, 'definition') else "定義は利用できません。"
             success_content = f"Successfully registered tool '{tool_to_register}'.\n\nTool Definition:\n{tool_definition}"
             # ▲▲▲ 以前の修正箇所 ▲▲▲
-            output = lpml.generate_element(
-                "output", f"\n{success_content}\n", tool=self.name, **attributes
-            )
         except Exception as e:
             logger.error(
                 f"Failed to instantiate/register tool '{tool_to_register}': {e}", exc_info=True
             )
             error_content = f"Error: Could not instantiate tool '{tool_to_register}'. {e}"
-            output = lpml.generate_element(
-                "output", f"\n{error_content}\n", tool=self.name, **attributes
-            )
-            
-        await self.system.result_queue.put(output)
+            await self._put_output(error_content, **attributes)
+            return
+
+        await self._put_output(success_content, **attributes)
 
 
 class ListAvailableToolsTool(tool.BaseTool):
@@ -110,14 +92,10 @@ class ListAvailableToolsTool(tool.BaseTool):
 
     async def run(self, element: lpml.Element):
         # ▼▼▼ 修正箇所 ▼▼▼
-        # ツールをリストアップする前に、必ずツールカタログをリフレッシュする
-        logger.info("Refreshing tool catalog as part of list_available_tools...")
-        self.tool_manager.discover_tools()
+        # ツールをリストアップする前に、ツールファイルに変化があればカタログをリフレッシュする
+        if self.tool_manager.refresh_tools():
+            logger.info("Refreshed tool catalog as part of list_available_tools.")
         # ▲▲▲ 修正箇所 ▲▲▲
 
-        tool_names = self.tool_manager.get_all_tool_classes().keys()
-        content = "\n".join(sorted(tool_names))
-        output = lpml.generate_element(
-            "output", f"\n{content}\n", tool=self.name
-        )
-        await self.system.result_queue.put(output)
\ No newline at end of file
+        content = "\n".join(sorted(self.tool_manager.get_all_tool_classes()))
+        await self._put_output(content)
\ No newline at end of file
@@ -0,0 +1,18 @@
+from solipsism.core.lpml import parse
+
+
+def test_parse_keeps_literal_placeholder_text():
+    # NUL-delimited indices look like the placeholders used for backticks
+    text = 'a \x000\x00 `x` <b>\x007\x00</b>'
+    assert parse(text) == [
+        'a \x000\x00 `x` ',
+        {'tag': 'b', 'attributes': {}, 'content': ['\x007\x00']},
+    ]
+
+
+def test_parse_restores_backticks_next_to_nul():
+    text = '\x00 `<k>` <t>`v`</t>'
+    assert parse(text) == [
+        '\x00 `<k>` ',
+        {'tag': 't', 'attributes': {}, 'content': ['`v`']},
+    ]